@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+# Reasons a request is shed, as counted in metrics
+QUEUE_FULL = 'queue_full'
+QUEUE_STALLED = 'queue_stalled'
+TIMED_OUT = 'timed_out'
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; retry_after is a hint in seconds for the client"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Not admitted ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('enqueued', 'admitted', 'event')
+
+    def __init__(self):
+        self.enqueued = time.monotonic()
+        self.admitted = False
+        self.event = threading.Event()
+
+
+class AdmissionController:
+    """Adaptive concurrency limit with a short admission queue
+
+    At most limit requests run at once. Others wait in arrival order for up
+    to max_wait seconds, with at most max_queued waiting; when the oldest
+    waiter has already waited half of max_wait the queue is not draining
+    and new requests are turned away at once instead of joining it.
+
+    The limit follows observed latency, as in the gradient algorithm of
+    Netflix's concurrency-limits: a slow moving average of request latency
+    is compared with a fast one. When recent requests are slower than
+    usual the limit shrinks in proportion; otherwise it grows by about
+    sqrt(limit) per adjustment.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 4, max_limit: int = 100,
+                 max_queued: int = 50, max_wait: float = 5.0, smoothing: float = 0.2,
+                 tolerance: float = 1.5, short_window: int = 10, long_window: int = 500):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self._short_alpha = 2.0 / (short_window + 1)
+        self._long_alpha = 2.0 / (long_window + 1)
+        self._limit = float(initial_limit)
+        self._short_latency = 0.0
+        self._long_latency = 0.0
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._queued_total = 0
+        self._shed: Dict[str, int] = {QUEUE_FULL: 0, QUEUE_STALLED: 0, TIMED_OUT: 0}
+        self._degraded = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def admit(self):
+        """Hold one of the concurrency slots for the enclosed work, or raise Overloaded"""
+        waiter = None
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+            else:
+                reason = self._refusal()
+                if reason is not None:
+                    self._shed[reason] += 1
+                    raise Overloaded(reason, self._retry_after())
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+                self._queued_total += 1
+
+        if waiter is not None and not waiter.event.wait(self.max_wait):
+            with self._lock:
+                # The slot may have been handed over while the wait timed out
+                if not waiter.admitted:
+                    self._waiters.remove(waiter)
+                    self._shed[TIMED_OUT] += 1
+                    raise Overloaded(TIMED_OUT, self._retry_after())
+
+        started = time.monotonic()
+        with self._lock:
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def record_degraded(self):
+        """Count a shed request that was answered from local data instead"""
+        with self._lock:
+            self._degraded += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current limit and load, and counts of admitted, shed and degraded requests"""
+        with self._lock:
+            oldest = time.monotonic() - self._waiters[0].enqueued if self._waiters else 0.0
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'queued': len(self._waiters),
+                'oldest_queued_ms': round(oldest * 1000, 1),
+                'admitted': self._admitted,
+                'queued_total': self._queued_total,
+                'shed': dict(self._shed, total=sum(self._shed.values())),
+                'degraded': self._degraded,
+                'latency_ms': {'recent': round(self._short_latency * 1000, 1),
+                               'baseline': round(self._long_latency * 1000, 1)}
+            }
+
+    def _refusal(self) -> Optional[str]:
+        """Reason to turn a request away instead of queueing it, None if it may wait"""
+        if len(self._waiters) >= self.max_queued:
+            return QUEUE_FULL
+        if self._waiters and time.monotonic() - self._waiters[0].enqueued > self.max_wait / 2:
+            return QUEUE_STALLED
+        return None
+
+    def _retry_after(self) -> int:
+        """Seconds until a retry is likely to get in: about one recent request latency"""
+        return max(1, min(30, math.ceil(self._short_latency)))
+
+    def _release(self, latency: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._update_limit(latency)
+            # Hand freed slots to waiters in arrival order
+            while self._waiters and self._in_flight < self.limit:
+                waiter = self._waiters.popleft()
+                waiter.admitted = True
+                self._in_flight += 1
+                waiter.event.set()
+
+    def _update_limit(self, latency: float):
+        if not self._long_latency:
+            self._short_latency = self._long_latency = latency
+            return
+        self._short_latency += self._short_alpha * (latency - self._short_latency)
+        self._long_latency += self._long_alpha * (latency - self._long_latency)
+        # Once latency recovers, a baseline inflated by a slowdown comes down faster
+        if self._long_latency > 2 * self._short_latency:
+            self._long_latency *= 0.95
+
+        gradient = max(0.5, min(1.0, self.tolerance * self._long_latency / max(self._short_latency, 1e-6)))
+        # A limit the load is not using says nothing about capacity, do not grow it
+        if gradient == 1.0 and self._in_flight < self._limit / 2:
+            return
+        target = self._limit * gradient + math.sqrt(self._limit)
+        limit = (1 - self.smoothing) * self._limit + self.smoothing * target
+        self._limit = max(float(self.min_limit), min(float(self.max_limit), limit))
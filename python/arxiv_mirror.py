@@ -0,0 +1,359 @@
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from sqlite_db import open_database, transaction
+
+logger = logging.getLogger(__name__)
+
+ARXIV_OAI_URL = "https://export.arxiv.org/oai2"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_output', 'arxiv_mirror.db')
+
+NAMESPACES = {
+    'oai': 'http://www.openarchives.org/OAI/2.0/',
+    'arxiv': 'http://arxiv.org/OAI/arXiv/'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY,
+    arxiv_id TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    abstract TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    doi TEXT NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    datestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS papers_updated ON papers(updated);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, authors, content='papers', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts(rowid, title, abstract, authors)
+    VALUES (new.id, new.title, new.abstract, new.authors);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract, authors)
+    VALUES ('delete', old.id, old.title, old.abstract, old.authors);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract, authors)
+    VALUES ('delete', old.id, old.title, old.abstract, old.authors);
+    INSERT INTO papers_fts(rowid, title, abstract, authors)
+    VALUES (new.id, new.title, new.abstract, new.authors);
+END;
+CREATE TABLE IF NOT EXISTS harvest_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+AUTHOR_SEPARATOR = '; '
+
+
+class OAIError(Exception):
+    """Error reported by an OAI-PMH endpoint"""
+
+
+class ArxivMirror:
+    """Local SQLite copy of arXiv metadata with a full-text index
+
+    Records are kept in a plain table with an FTS5 index over title,
+    abstract and authors. The harvest checkpoint (last datestamp and any
+    in-progress resumption token) lives in the same database, so pages are
+    stored and checkpointed in one transaction.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        open_database(db_path, SCHEMA)
+
+    def _transaction(self):
+        """Connection to the mirror database, committed on success and then closed"""
+        return transaction(self.db_path)
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Read a harvest checkpoint value"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT value FROM harvest_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def store_page(self, records: Iterable[Dict[str, str]], deleted: Iterable[str],
+                   resumption_token: Optional[str], started: Optional[str] = None):
+        """Store one harvested page together with the token that continues it
+
+        started is the OAI responseDate of the run's first page, kept so a
+        resumed run still knows when the listing it continues began.
+        """
+        with self._transaction() as conn:
+            conn.executemany(
+                """INSERT INTO papers (arxiv_id, title, abstract, authors, categories, doi,
+                                       created, updated, datestamp)
+                   VALUES (:arxiv_id, :title, :abstract, :authors, :categories, :doi,
+                           :created, :updated, :datestamp)
+                   ON CONFLICT(arxiv_id) DO UPDATE SET
+                       title = excluded.title, abstract = excluded.abstract,
+                       authors = excluded.authors, categories = excluded.categories,
+                       doi = excluded.doi, created = excluded.created,
+                       updated = excluded.updated, datestamp = excluded.datestamp""",
+                list(records))
+            conn.executemany('DELETE FROM papers WHERE arxiv_id = ?', [(arxiv_id,) for arxiv_id in deleted])
+            self._set_state(conn, 'resumption_token', resumption_token)
+            if started:
+                self._set_state(conn, 'harvest_started', started)
+
+    def finish_harvest(self, synced_through: Optional[str] = None):
+        """Advance the checkpoints once a harvest has run to completion
+
+        synced_through is when the completed listing was taken (the OAI
+        responseDate of its first page); the mirror holds every change
+        made before it.
+        """
+        with self._transaction() as conn:
+            latest = conn.execute('SELECT MAX(datestamp) FROM papers').fetchone()[0]
+            if latest:
+                self._set_state(conn, 'datestamp', latest)
+            if synced_through:
+                self._set_state(conn, 'synced_through', synced_through)
+            self._set_state(conn, 'resumption_token', None)
+            self._set_state(conn, 'harvest_started', None)
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: Optional[str]):
+        if value is None:
+            conn.execute('DELETE FROM harvest_state WHERE key = ?', (key,))
+        else:
+            conn.execute('INSERT OR REPLACE INTO harvest_state (key, value) VALUES (?, ?)', (key, value))
+
+    def synced_through(self) -> Optional[datetime]:
+        """Time the mirror is complete up to, or None if it was never fully harvested
+
+        That is when the last completed harvest began, even if it found no
+        new records; mirrors harvested before this was recorded fall back
+        to their newest record datestamp.
+        """
+        synced = self.get_state('synced_through') or self.get_state('datestamp')
+        if not synced:
+            return None
+        if 'T' in synced:
+            return datetime.strptime(synced, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        return datetime.strptime(synced[:10], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+    def count(self) -> int:
+        """Number of papers in the mirror"""
+        with self._transaction() as conn:
+            return conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """Search the mirror, matching every query term and newest updates first"""
+        terms = [term for term in query.split() if term.strip() and term != 'sort:date']
+        if not terms:
+            return []
+        # Quoting each term makes FTS5 treat punctuation and operators literally
+        match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """SELECT p.arxiv_id, p.title, p.abstract, p.authors, p.created, p.updated, p.doi
+                   FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                   WHERE papers_fts MATCH ?
+                   ORDER BY p.updated DESC
+                   LIMIT ?""",
+                (match, max_results)).fetchall()
+        return [self._format_paper(row) for row in rows]
+
+    @staticmethod
+    def _format_paper(row: Tuple) -> Dict[str, Any]:
+        """Format a row like the papers returned by the live arXiv search"""
+        arxiv_id, title, abstract, authors, created, updated, doi = row
+        paper = {
+            "id": arxiv_id,
+            "title": title,
+            "authors": authors.split(AUTHOR_SEPARATOR) if authors else [],
+            "abstract": abstract,
+            "year": created[:4],
+            "url": f"http://arxiv.org/abs/{arxiv_id}",
+            "pdf_url": f"http://arxiv.org/pdf/{arxiv_id}.pdf",
+            "citations": 0,
+            "journal": "arXiv"
+        }
+        if doi:
+            paper["doi"] = doi
+        return paper
+
+
+class OAIHarvester:
+    """Incremental OAI-PMH harvester that fills an ArxivMirror
+
+    Each run asks for records changed since the stored datestamp and
+    follows resumption tokens page by page. The token is saved with every
+    page, so an interrupted run picks up where it stopped. base_url can
+    point at any OAI-PMH endpoint serving the arXiv metadata format, such
+    as a local stand-in.
+    """
+
+    def __init__(self, mirror: ArxivMirror, base_url: str = ARXIV_OAI_URL, set_spec: Optional[str] = None,
+                 session: Optional[requests.Session] = None, timeout: float = 60, max_retries: int = 5):
+        self.mirror = mirror
+        self.base_url = base_url
+        self.set_spec = set_spec
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def harvest(self, until: Optional[str] = None, max_pages: Optional[int] = None) -> int:
+        """Harvest new and changed records and return how many were stored
+
+        With max_pages the run may stop early; the next run resumes from
+        the saved resumption token.
+        """
+        token = self.mirror.get_state('resumption_token')
+        checkpoint = self.mirror.get_state('datestamp')
+        # A resumed run is only as current as the listing it continues
+        started = self.mirror.get_state('harvest_started') if token else None
+        stored = 0
+        pages = 0
+
+        while True:
+            if token:
+                params = {'verb': 'ListRecords', 'resumptionToken': token}
+            else:
+                params = {'verb': 'ListRecords', 'metadataPrefix': 'arXiv'}
+                if checkpoint:
+                    params['from'] = checkpoint
+                if until:
+                    params['until'] = until
+                if self.set_spec:
+                    params['set'] = self.set_spec
+
+            root = self._request(params)
+            if not token and not started:
+                started = (root.findtext('oai:responseDate', '', NAMESPACES) or '').strip() or None
+            error = root.find('oai:error', NAMESPACES)
+            if error is not None:
+                if error.get('code') == 'noRecordsMatch':
+                    break
+                raise OAIError(f"{error.get('code')}: {(error.text or '').strip()}")
+
+            records, deleted = self._parse_records(root)
+            # The last page carries an empty resumptionToken element
+            token = (root.findtext('.//oai:resumptionToken', '', NAMESPACES) or '').strip() or None
+
+            self.mirror.store_page(records, deleted, token, started)
+            stored += len(records)
+            pages += 1
+            logger.info(f"Harvested page {pages}: {len(records)} records, {len(deleted)} deleted")
+
+            if not token:
+                break
+            if max_pages is not None and pages >= max_pages:
+                return stored
+
+        # A harvest cut off at until is only complete up to that date
+        self.mirror.finish_harvest(None if until else started)
+        return stored
+
+    def _request(self, params: Dict[str, str]) -> ET.Element:
+        """Send an OAI-PMH request, honouring 503 Retry-After flow control"""
+        for attempt in range(self.max_retries + 1):
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            if response.status_code == 503 and attempt < self.max_retries:
+                retry_after = response.headers.get('Retry-After', '')
+                delay = min(int(retry_after), 300) if retry_after.isdigit() else 10 * (attempt + 1)
+                logger.info(f"OAI-PMH endpoint busy, retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return ET.fromstring(response.content)
+        raise OAIError("OAI-PMH endpoint kept answering 503")
+
+    @staticmethod
+    def _parse_records(root: ET.Element) -> Tuple[List[Dict[str, str]], List[str]]:
+        """Extract arXiv-format records and deleted identifiers from a ListRecords page"""
+        records = []
+        deleted = []
+        for record in root.iterfind('.//oai:record', NAMESPACES):
+            header = record.find('oai:header', NAMESPACES)
+            datestamp = header.findtext('oai:datestamp', '', NAMESPACES)
+            if header.get('status') == 'deleted':
+                identifier = header.findtext('oai:identifier', '', NAMESPACES)
+                deleted.append(identifier.rsplit(':', 1)[-1])
+                continue
+
+            metadata = record.find('oai:metadata/arxiv:arXiv', NAMESPACES)
+            if metadata is None:
+                continue
+
+            authors = []
+            for author in metadata.iterfind('arxiv:authors/arxiv:author', NAMESPACES):
+                name = ' '.join(part for part in (
+                    author.findtext('arxiv:forenames', '', NAMESPACES).strip(),
+                    author.findtext('arxiv:keyname', '', NAMESPACES).strip()
+                ) if part)
+                if name:
+                    authors.append(name)
+
+            created = metadata.findtext('arxiv:created', '', NAMESPACES).strip()
+            records.append({
+                'arxiv_id': metadata.findtext('arxiv:id', '', NAMESPACES).strip(),
+                'title': ' '.join(metadata.findtext('arxiv:title', '', NAMESPACES).split()),
+                'abstract': metadata.findtext('arxiv:abstract', '', NAMESPACES).strip(),
+                'authors': AUTHOR_SEPARATOR.join(authors),
+                'categories': metadata.findtext('arxiv:categories', '', NAMESPACES).strip(),
+                'doi': metadata.findtext('arxiv:doi', '', NAMESPACES).strip(),
+                'created': created,
+                'updated': metadata.findtext('arxiv:updated', '', NAMESPACES).strip() or created,
+                'datestamp': datestamp
+            })
+        return records, deleted
+
+
+_mirrors: Dict[str, ArxivMirror] = {}
+
+
+def get_mirror(db_path: Optional[str] = None) -> Optional[ArxivMirror]:
+    """Open the local mirror if one has been harvested, from ARXIV_MIRROR_DB or the default path"""
+    db_path = db_path or os.environ.get('ARXIV_MIRROR_DB') or DEFAULT_DB_PATH
+    mirror = _mirrors.get(db_path)
+    if mirror is None:
+        if not os.path.exists(db_path):
+            return None
+        try:
+            mirror = _mirrors.setdefault(db_path, ArxivMirror(db_path))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not open arXiv mirror at {db_path}: {e}")
+            return None
+    return mirror if mirror.synced_through() is not None else None
+
+
+def mirror_lag(mirror: ArxivMirror) -> timedelta:
+    """How far the mirror's checkpoint trails the current time"""
+    return datetime.now(timezone.utc) - mirror.synced_through()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally harvest arXiv metadata into a local mirror")
+    parser.add_argument('--db', default=os.environ.get('ARXIV_MIRROR_DB', DEFAULT_DB_PATH),
+                        help="SQLite database to harvest into")
+    parser.add_argument('--base-url', default=ARXIV_OAI_URL, help="OAI-PMH endpoint")
+    parser.add_argument('--set', dest='set_spec', help="Restrict the harvest to an OAI set, e.g. cs")
+    parser.add_argument('--until', help="Harvest records up to this date (YYYY-MM-DD)")
+    parser.add_argument('--max-pages', type=int, help="Stop after this many pages; the next run resumes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start_time = time.time()
+    harvester = OAIHarvester(ArxivMirror(args.db), args.base_url, args.set_spec)
+    count = harvester.harvest(args.until, args.max_pages)
+    print(f"Stored {count} records in {time.time() - start_time:.2f} seconds", file=sys.stderr)
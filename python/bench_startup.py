@@ -0,0 +1,50 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter per sample so nothing is already imported
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module} as app_module
+imported = time.perf_counter()
+ready = app_module.prewarmer.wait({ready_timeout})
+warm = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'ready_ms': (warm - start) * 1000, 'ready': ready}}))
+"""
+
+
+def run_sample(module: str, ready_timeout: float) -> dict:
+    """Measure one cold start of module in a new process"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, ready_timeout=ready_timeout)],
+        cwd=here, capture_output=True, text=True, timeout=ready_timeout + 60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold start time of the search services")
+    parser.add_argument('--module', default='improved_app', help="Service module to start")
+    parser.add_argument('--runs', type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument('--ready-timeout', type=float, default=30, help="Seconds to wait for warmup")
+    args = parser.parse_args()
+
+    samples = [run_sample(args.module, args.ready_timeout) for _ in range(args.runs)]
+    import_times = [sample['import_ms'] for sample in samples]
+    ready_times = [sample['ready_ms'] for sample in samples]
+    print(json.dumps({
+        'module': args.module,
+        'runs': args.runs,
+        'import_ms_median': round(statistics.median(import_times), 1),
+        'import_ms_max': round(max(import_times), 1),
+        'ready_ms_median': round(statistics.median(ready_times), 1),
+        'ready_ms_max': round(max(ready_times), 1),
+        'all_ready': all(sample['ready'] for sample in samples)
+    }, indent=2))
@@ -0,0 +1,176 @@
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from search_cache import canonicalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    """Heavy-hitters sketch keeping approximate counts for at most capacity keys"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, key: str) -> Optional[str]:
+        """Count one occurrence of key and return the key it evicted, if any"""
+        if key in self.counts:
+            self.counts[key] += 1
+            return None
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            return None
+
+        # The newcomer inherits the smallest count, which bounds its overestimate
+        evicted = min(self.counts, key=self.counts.get)
+        self.counts[key] = self.counts.pop(evicted) + 1
+        return evicted
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        """Return the n keys with the highest counts"""
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def decay(self):
+        """Halve every count so popularity follows recent traffic"""
+        self.counts = {key: count // 2 for key, count in self.counts.items() if count > 1}
+
+
+class CacheWarmer:
+    """Background refresher for the most popular search queries
+
+    Queries are counted in a SpaceSaving sketch. Every interval seconds the
+    top_n queries whose cache entries expire within refresh_window seconds
+    are fetched again, and queries that clients page through ("load more"
+    requests with a growing limit) get their next page prefetched. Warm
+    fetches only run while no live request is in flight, at most one per
+    min_fetch_interval seconds, and pause for backoff seconds after an
+    upstream failure so they never take quota away from live traffic.
+    """
+
+    def __init__(self, service, top_n: int = 20, interval: float = 30, refresh_window: float = 300,
+                 min_fetch_interval: float = 2.0, quiet_period: float = 1.0, backoff: float = 60,
+                 max_limit: int = 50, sketch_capacity: int = 256, decay_every: int = 20):
+        self.service = service
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_window = refresh_window
+        self.min_fetch_interval = min_fetch_interval
+        self.quiet_period = quiet_period
+        self.backoff = backoff
+        self.max_limit = max_limit
+        self.decay_every = decay_every
+
+        self.sketch = SpaceSaving(sketch_capacity)
+        # canonical key -> (query, largest limit requested, last limit increase or 0)
+        self._queries: Dict[str, Tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_live = 0.0
+        self._next_fetch = 0.0
+        self._cycles = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, query: str, limit: int):
+        """Count a live request for a query"""
+        key = canonicalize_query(query)
+        with self._lock:
+            evicted = self.sketch.add(key)
+            if evicted is not None:
+                self._queries.pop(evicted, None)
+
+            previous = self._queries.get(key)
+            if previous is None:
+                self._queries[key] = (query, limit, 0)
+            elif limit > previous[1]:
+                self._queries[key] = (query, limit, limit - previous[1])
+            else:
+                self._queries[key] = (query, previous[1], previous[2])
+
+    @contextmanager
+    def live_request(self):
+        """Mark a live request as in flight so warm fetches hold off"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._last_live = time.time()
+
+    def start(self):
+        """Start the background warming thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background warming thread"""
+        self._stop.set()
+
+    def warm_once(self) -> int:
+        """Run one warming pass and return the number of upstream fetches made"""
+        with self._lock:
+            candidates = [self._queries[key] for key, _ in self.sketch.top(self.top_n)
+                          if key in self._queries]
+
+        fetches = 0
+        for query, limit, page_size in candidates:
+            entry = self.service.cache.peek(query)
+            next_page = min(limit + page_size, self.max_limit)
+            if entry is None or entry.remaining() < self.refresh_window:
+                target = max(limit, entry.limit if entry is not None else 0)
+                refresh = True
+            elif page_size and entry.limit < next_page and not entry.covers(entry.limit + 1):
+                target = next_page
+                refresh = False
+            else:
+                continue
+
+            if not self._may_fetch():
+                break
+            fetches += 1
+            if not self._fetch(query, target, refresh):
+                break
+
+        self._cycles += 1
+        if self._cycles % self.decay_every == 0:
+            with self._lock:
+                self.sketch.decay()
+                # Decay drops keys seen only once; their queries go with them
+                self._queries = {key: value for key, value in self._queries.items() if key in self.sketch.counts}
+        return fetches
+
+    def _may_fetch(self) -> bool:
+        """Check whether a warm fetch may run without competing with live traffic"""
+        now = time.time()
+        with self._lock:
+            idle = self._in_flight == 0 and now - self._last_live >= self.quiet_period
+        return idle and now >= self._next_fetch
+
+    def _fetch(self, query: str, limit: int, refresh: bool) -> bool:
+        """Fetch a query into the cache, backing off if the upstream fails"""
+        try:
+            entry = self.service.search_entry(query, limit, refresh=refresh)
+            succeeded = entry.data.get('success', False)
+        except Exception as e:
+            logger.warning(f"Cache warming failed for {query}: {e}")
+            succeeded = False
+
+        delay = self.min_fetch_interval if succeeded else self.backoff
+        self._next_fetch = time.time() + delay
+        return succeeded
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.warm_once()
+            except Exception as e:
+                logger.warning(f"Cache warming pass failed: {e}")
@@ -0,0 +1,324 @@
+import concurrent.futures
+import contextvars
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from enrichment import BATCH_SIZE, OPENALEX_WORKS_URL, paper_doi
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
+
+# Fields a graph node is built from; referenced_works gives the outgoing edges
+SELECT_FIELDS = "id,doi,title,publication_year,cited_by_count,authorships,referenced_works"
+
+DIRECTIONS = ('references', 'cited_by', 'both')
+
+_WORK_ID = re.compile(r'(?:openalex\.org/)?W(\d+)$', re.IGNORECASE)
+
+
+def work_number(value: str) -> Optional[int]:
+    """Integer part of an OpenAlex work id (W123 or https://openalex.org/W123)"""
+    match = _WORK_ID.search((value or '').strip())
+    return int(match.group(1)) if match else None
+
+
+def work_id(number: int) -> str:
+    """Full OpenAlex work id of an integer id"""
+    return f"https://openalex.org/W{number}"
+
+
+class AdjacencyStore:
+    """Compact cache of citation graph nodes and edges
+
+    Works are keyed by the integer part of their OpenAlex id and edge lists
+    are kept as arrays of those integers. Citing lists are only stored
+    when they were fetched completely. Entries expire after max_age seconds
+    and the least recently used nodes are dropped beyond max_nodes.
+    """
+
+    def __init__(self, max_age: float = 86400, max_nodes: int = 200000):
+        self.max_age = max_age
+        self.max_nodes = max_nodes
+        self._nodes: 'OrderedDict[int, Tuple[float, Dict[str, Any], array]]' = OrderedDict()
+        self._cited_by: Dict[int, Tuple[float, array]] = {}
+        self._lock = threading.Lock()
+
+    def node(self, number: int) -> Optional[Tuple[Dict[str, Any], array]]:
+        """Cached (paper, references) of a work"""
+        with self._lock:
+            cached = self._nodes.get(number)
+            if cached is None or time.time() - cached[0] > self.max_age:
+                return None
+            self._nodes.move_to_end(number)
+            return cached[1], cached[2]
+
+    def cited_by(self, number: int) -> Optional[array]:
+        """Cached ids of the works citing a work"""
+        with self._lock:
+            cached = self._cited_by.get(number)
+            if cached is None or time.time() - cached[0] > self.max_age:
+                return None
+            return cached[1]
+
+    def add_node(self, number: int, paper: Dict[str, Any], references: Iterable[int]):
+        with self._lock:
+            self._nodes[number] = (time.time(), paper, array('Q', references))
+            self._nodes.move_to_end(number)
+            while len(self._nodes) > self.max_nodes:
+                evicted, _ = self._nodes.popitem(last=False)
+                self._cited_by.pop(evicted, None)
+
+    def add_cited_by(self, number: int, citing: Iterable[int]):
+        with self._lock:
+            self._cited_by[number] = (time.time(), array('Q', citing))
+
+
+class CitationGraph:
+    """Breadth-first expansion of the citation graph around seed works
+
+    Each frontier is fetched from OpenAlex in batched `filter=openalex_id:`
+    (references) and `filter=cites:` (citing works) queries, at most
+    max_workers at a time, and everything seen is kept in an
+    AdjacencyStore. expand() yields node events as soon as each batch
+    arrives, so callers can stream them, and each edge once both its works
+    have been sent as nodes.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, store: Optional[AdjacencyStore] = None,
+                 max_workers: int = 4, timeout: float = 30, mailto: str = 'research@example.com',
+                 scheduler=None):
+        self.session = session or requests.Session()
+        self.store = store or AdjacencyStore()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.mailto = mailto
+        self.scheduler = scheduler
+
+    def expand(self, seeds: List[str], direction: str = 'references', depth: int = 1,
+               max_frontier: int = 200, max_nodes: int = 1000,
+               time_budget: float = 20) -> Iterator[Dict[str, Any]]:
+        """Traverse from seed ids (OpenAlex ids or DOIs) and yield node, edge and done events"""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+        deadline = time.monotonic() + time_budget
+        seen = set()
+        # References and citing lists of a later level lead back to earlier nodes, send each edge once
+        sent_edges = set()
+        # Batches that failed, their nodes and the edges to them are missing from the graph
+        failures: List[Exception] = []
+        truncated = None
+
+        try:
+            frontier = self._resolve(seeds)
+        except Exception as e:
+            logger.warning(f"Resolving citation graph seeds failed: {e}")
+            yield {'type': 'done', 'nodes': 0, 'edges': 0, 'truncated': None,
+                   'error': f"Resolving seeds failed: {e}"}
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for event in self._load_nodes(executor, frontier, deadline, failures):
+                seen.add(event['number'])
+                yield self._node_event(event, 0)
+
+            for level in range(1, depth + 1):
+                frontier = [number for number in frontier if self.store.node(number) is not None]
+                found: List[int] = []
+                found_set = set()
+                # (citing, cited) pairs, sent once both works have been sent as nodes
+                edges: List[Tuple[int, int]] = []
+
+                def discover(number: int):
+                    if number in seen or number in found_set:
+                        return
+                    if len(seen) + len(found) < max_nodes and len(found) < max_frontier:
+                        found.append(number)
+                        found_set.add(number)
+
+                if direction in ('references', 'both'):
+                    for source in frontier:
+                        for target in self.store.node(source)[1]:
+                            discover(target)
+                            edges.append((source, target))
+
+                if direction in ('cited_by', 'both'):
+                    for source, citing in self._load_citing(executor, frontier, max_frontier, deadline, failures):
+                        for number in citing:
+                            discover(number)
+                            edges.append((number, source))
+
+                for event in self._load_nodes(executor, found, deadline, failures):
+                    seen.add(event['number'])
+                    yield self._node_event(event, level)
+
+                for citing, cited in edges:
+                    if citing in seen and cited in seen and (citing, cited) not in sent_edges:
+                        sent_edges.add((citing, cited))
+                        yield {'type': 'edge', 'source': work_id(citing), 'target': work_id(cited)}
+
+                if time.monotonic() > deadline:
+                    truncated = 'time_budget'
+                    break
+                if len(seen) >= max_nodes:
+                    truncated = 'max_nodes'
+                    break
+                frontier = found
+                if not frontier:
+                    break
+        finally:
+            # Batches still running past the time budget are abandoned, not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if truncated is None and failures:
+            truncated = 'failed_batches'
+        yield {'type': 'done', 'nodes': len(seen), 'edges': len(sent_edges), 'truncated': truncated,
+               'failed_batches': len(failures)}
+
+    @staticmethod
+    def _node_event(event: Dict[str, Any], level: int) -> Dict[str, Any]:
+        return {'type': 'node', 'depth': level, 'paper': event['paper']}
+
+    def _resolve(self, seeds: List[str]) -> List[int]:
+        """Turn seed OpenAlex ids and DOIs into work numbers"""
+        numbers = []
+        dois = []
+        for seed in seeds:
+            number = work_number(seed)
+            if number is not None:
+                numbers.append(number)
+            else:
+                doi = paper_doi({'id': seed})
+                if doi:
+                    dois.append(doi)
+        for start in range(0, len(dois), BATCH_SIZE):
+            batch = [doi for doi in dois[start:start + BATCH_SIZE] if '|' not in doi and ',' not in doi]
+            for work in self._fetch({'filter': 'doi:' + '|'.join(batch), 'per-page': len(batch)}):
+                numbers.append(self._store_work(work)[0])
+        return [number for number in dict.fromkeys(numbers) if number is not None]
+
+    def _load_nodes(self, executor, numbers: List[int], deadline: float,
+                    failures: List[Exception]) -> Iterator[Dict[str, Any]]:
+        """Yield the records of works, fetching the uncached ones in concurrent batches"""
+        missing = []
+        for number in numbers:
+            cached = self.store.node(number)
+            if cached is not None:
+                yield {'number': number, 'paper': cached[0]}
+            else:
+                missing.append(number)
+
+        batches = [missing[start:start + BATCH_SIZE] for start in range(0, len(missing), BATCH_SIZE)]
+        # Batches run in the caller's context so scheduler slots go to the caller's tenant
+        futures = [executor.submit(contextvars.copy_context().run, self._fetch_works, batch) for batch in batches]
+        for result in self._completed(futures, deadline, failures):
+            for number, paper in result:
+                yield {'number': number, 'paper': paper}
+
+    def _load_citing(self, executor, numbers: List[int], limit: int, deadline: float,
+                     failures: List[Exception]) -> Iterator[Tuple[int, List[int]]]:
+        """Yield (work, citing works) pairs, fetching uncached citing lists in concurrent batches"""
+        missing = []
+        for number in numbers:
+            cached = self.store.cited_by(number)
+            if cached is not None:
+                yield number, list(cached)
+            else:
+                missing.append(number)
+
+        batches = [missing[start:start + BATCH_SIZE] for start in range(0, len(missing), BATCH_SIZE)]
+        futures = [executor.submit(contextvars.copy_context().run, self._fetch_citing, batch, limit)
+                   for batch in batches]
+        for result in self._completed(futures, deadline, failures):
+            yield from result.items()
+
+    @staticmethod
+    def _completed(futures: List[concurrent.futures.Future], deadline: float,
+                   failures: List[Exception]) -> Iterator[Any]:
+        """Results of batches as they finish; failed batches are added to failures, the rest stops at the deadline"""
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.warning(f"Citation graph batch failed: {e}")
+                    failures.append(e)
+        except concurrent.futures.TimeoutError:
+            logger.warning("Citation graph expansion ran out of time")
+
+    def _fetch_works(self, numbers: List[int]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Fetch the records of up to BATCH_SIZE works in one request"""
+        params = {'filter': 'openalex_id:' + '|'.join(f"W{number}" for number in numbers),
+                  'per-page': len(numbers)}
+        return [stored for stored in map(self._store_work, self._fetch(params)) if stored[0] is not None]
+
+    def _fetch_citing(self, numbers: List[int], limit: int) -> Dict[int, List[int]]:
+        """Fetch works citing any of a batch, following cursor pages up to limit results"""
+        wanted = set(numbers)
+        citing: Dict[int, List[int]] = {number: [] for number in numbers}
+        params = {'filter': 'cites:' + '|'.join(f"W{number}" for number in numbers),
+                  'per-page': min(PAGE_SIZE, limit), 'cursor': '*'}
+        fetched = 0
+        complete = False
+        while fetched < limit:
+            data = self._get(params)
+            for work in data.get('results', []):
+                number, _ = self._store_work(work)
+                fetched += 1
+                if number is None:
+                    continue
+                # A citing work may cite several works of the batch
+                for target in self._references(work):
+                    if target in wanted:
+                        citing[target].append(number)
+            params['cursor'] = (data.get('meta') or {}).get('next_cursor')
+            if not params['cursor'] or not data.get('results'):
+                complete = True
+                break
+
+        # Partial lists would hide citations on later lookups, only complete ones are cached
+        if complete:
+            for number, numbers_citing in citing.items():
+                self.store.add_cited_by(number, numbers_citing)
+        return citing
+
+    def _fetch(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._get(params).get('results', [])
+
+    def _get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(params, select=SELECT_FIELDS, mailto=self.mailto)
+        with self.scheduler.slot('openalex') if self.scheduler is not None else nullcontext():
+            response = self.session.get(OPENALEX_WORKS_URL, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _references(work: Dict[str, Any]) -> List[int]:
+        numbers = (work_number(reference) for reference in work.get('referenced_works') or [])
+        return [number for number in numbers if number is not None]
+
+    def _store_work(self, work: Dict[str, Any]) -> Tuple[Optional[int], Dict[str, Any]]:
+        """Cache a fetched work and return its number and paper record"""
+        number = work_number(work.get('id') or '')
+        paper = {
+            'id': work.get('id', ''),
+            'title': work.get('title') or 'No title',
+            'authors': [(authorship.get('author') or {}).get('display_name', '')
+                        for authorship in work.get('authorships') or []],
+            'year': work.get('publication_year', ''),
+            'url': work.get('doi') or work.get('id', ''),
+            'citations': work.get('cited_by_count', 0),
+            'source': 'openalex'
+        }
+        if number is not None:
+            self.store.add_node(number, paper, self._references(work))
+        return number, paper
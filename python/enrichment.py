@@ -0,0 +1,161 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+OPENALEX_WORKS_URL = "https://api.openalex.org/works"
+
+# OpenAlex accepts up to 100 OR-ed values per filter; 50 keeps URLs short
+BATCH_SIZE = 50
+
+# Only the fields enrichment reads are requested from OpenAlex
+SELECT_FIELDS = "doi,cited_by_count,primary_location,best_oa_location,open_access,concepts"
+
+_ARXIV_ID = re.compile(r'arxiv\.org/(?:abs|pdf)/(.+?)(?:v\d+)?(?:\.pdf)?$', re.IGNORECASE)
+_DOI = re.compile(r'(10\.\d{4,9}/[^\s]+)')
+_PLACEHOLDER_VENUES = {'', 'arxiv', 'unknown journal'}
+
+
+def paper_doi(paper: Dict[str, Any]) -> Optional[str]:
+    """Return the lower-cased DOI a paper can be looked up by in OpenAlex
+
+    arXiv papers are mapped to the DOI arXiv registers for every preprint
+    (10.48550/arXiv.<id>).
+    """
+    for value in (paper.get('url'), paper.get('id')):
+        match = _ARXIV_ID.search(value or '')
+        if match:
+            return f"10.48550/arxiv.{match.group(1)}".lower()
+
+    for value in (paper.get('doi'), paper.get('url'), paper.get('id')):
+        match = _DOI.search(value or '')
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+class PaperEnricher:
+    """Fills citations, venues, PDF links and open-access data from OpenAlex
+
+    DOIs of a whole result page are looked up with batched
+    `filter=doi:a|b|c` queries, so a page costs one or two round trips.
+    Lookups are cached per DOI, including DOIs OpenAlex does not know;
+    beyond max_entries DOIs the least recently used are dropped.
+    """
+
+    def __init__(self, cache_duration: float = 86400, timeout: float = 15,
+                 mailto: str = 'research@example.com', session: Optional[requests.Session] = None,
+                 scheduler=None, max_entries: int = 50000):
+        self.cache_duration = cache_duration
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.mailto = mailto
+        self.session = session or requests.Session()
+        self.scheduler = scheduler
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enrich(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Enrich papers in place and return them; lookup failures leave papers unchanged"""
+        dois = {}
+        for paper in papers:
+            doi = paper_doi(paper)
+            if doi:
+                dois.setdefault(doi, []).append(paper)
+        if not dois:
+            return papers
+
+        records = self._cached_records(dois)
+        missing = [doi for doi in dois if doi not in records]
+        for start in range(0, len(missing), BATCH_SIZE):
+            try:
+                records.update(self._fetch_batch(missing[start:start + BATCH_SIZE]))
+            except Exception as e:
+                logger.warning(f"OpenAlex enrichment failed: {e}")
+                break
+
+        for doi, doi_papers in dois.items():
+            work = records.get(doi)
+            if work:
+                for paper in doi_papers:
+                    self._apply(paper, work)
+        return papers
+
+    def _cached_records(self, dois: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Return fresh cached lookups for the given DOIs"""
+        now = time.time()
+        records = {}
+        with self._lock:
+            for doi in dois:
+                cached = self._cache.get(doi)
+                if cached is not None and now - cached['timestamp'] < self.cache_duration:
+                    records[doi] = cached['work']
+                    self._cache.move_to_end(doi)
+        return records
+
+    def _fetch_batch(self, dois: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up one batch of DOIs with a single OpenAlex request"""
+        # '|' and ',' are filter syntax, DOIs containing them cannot be batched
+        batch = [doi for doi in dois if '|' not in doi and ',' not in doi]
+        if not batch:
+            return {}
+        params = {
+            'filter': 'doi:' + '|'.join(batch),
+            'select': SELECT_FIELDS,
+            'per-page': len(batch),
+            'mailto': self.mailto
+        }
+        # Lookups count against the OpenAlex budget of the tenant whose search they enrich
+        with self.scheduler.slot('openalex') if self.scheduler is not None else nullcontext():
+            response = self.session.get(OPENALEX_WORKS_URL, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        # DOIs OpenAlex does not return are cached as None so they are not asked for again
+        records: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(batch)
+        for work in response.json().get('results', []):
+            doi = _DOI.search(work.get('doi') or '')
+            if doi:
+                records[doi.group(1).lower()] = work
+
+        now = time.time()
+        with self._lock:
+            for doi, work in records.items():
+                self._cache[doi] = {'work': work, 'timestamp': now}
+                self._cache.move_to_end(doi)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return records
+
+    @staticmethod
+    def _apply(paper: Dict[str, Any], work: Dict[str, Any]):
+        """Copy the fields OpenAlex knows better into a paper"""
+        paper['citations'] = max(paper.get('citations') or 0, work.get('cited_by_count') or 0)
+
+        # Repositories such as arXiv itself are not a better venue than the one we have
+        source = (work.get('primary_location') or {}).get('source') or {}
+        venue = source.get('display_name')
+        if (venue and source.get('type') != 'repository'
+                and (paper.get('journal') or '').lower() in _PLACEHOLDER_VENUES):
+            paper['journal'] = venue
+
+        if not paper.get('pdf_url'):
+            oa_location = work.get('best_oa_location') or {}
+            pdf_url = oa_location.get('pdf_url') or (work.get('open_access') or {}).get('oa_url')
+            if pdf_url:
+                paper['pdf_url'] = pdf_url
+
+        open_access = work.get('open_access') or {}
+        if 'is_oa' in open_access:
+            paper['open_access'] = open_access['is_oa']
+
+        concepts = [concept['display_name'] for concept in work.get('concepts') or []
+                    if concept.get('score', 0) >= 0.3 and concept.get('display_name')]
+        if concepts:
+            paper['concepts'] = concepts[:5]
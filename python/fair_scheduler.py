@@ -0,0 +1,277 @@
+import contextvars
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Priority classes, served strictly in this order
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# Metrics row adding up the tenants not listed on their own
+OTHER_TENANTS = 'other'
+
+# Tenant and priority of the code running in this context; untagged work is background
+_current: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar(
+    'scheduler_tenant', default=('system', BACKGROUND))
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a request waited longer than max_wait for an upstream slot"""
+
+
+class _Ticket:
+    __slots__ = ('tenant', 'priority', 'cost', 'enqueued', 'granted', 'event')
+
+    def __init__(self, tenant: str, priority: str, cost: float):
+        self.tenant = tenant
+        self.priority = priority
+        self.cost = cost
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.event = threading.Event()
+
+
+class _TenantStats:
+    __slots__ = ('granted', 'timed_out', 'wait_seconds', 'max_wait_seconds', 'last_seen')
+
+    def __init__(self):
+        self.granted = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_seen = time.monotonic()
+
+    def add(self, other: '_TenantStats'):
+        self.granted += other.granted
+        self.timed_out += other.timed_out
+        self.wait_seconds += other.wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, other.max_wait_seconds)
+
+
+class SourceScheduler:
+    """Deficit round-robin over tenants for one upstream source
+
+    Requests are granted at most rate per second with at most max_in_flight
+    running at once. Interactive requests always go before background ones;
+    within a class, tenants take turns and each turn a tenant may spend up
+    to its weight in request cost, so a tenant with a long queue cannot
+    crowd out the others.
+
+    Usage is counted per tenant. Tenants idle for stats_idle seconds, and
+    the least recently seen beyond max_tenants, are folded into one
+    "other" row; metrics list the max_reported busiest tenants on their
+    own and add the rest to that row.
+    """
+
+    def __init__(self, name: str, rate: float, max_in_flight: int = 4, quantum: float = 1.0,
+                 weights: Optional[Dict[str, float]] = None, stats_idle: float = 3600,
+                 max_tenants: int = 1000, max_reported: int = 50):
+        self.name = name
+        self.interval = 1.0 / rate
+        self.max_in_flight = max_in_flight
+        self.quantum = quantum
+        self.weights = weights or {}
+        self.stats_idle = stats_idle
+        self.max_tenants = max_tenants
+        self.max_reported = max_reported
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Dict[str, Deque[_Ticket]]] = {priority: {} for priority in PRIORITIES}
+        self._active: Dict[str, Deque[str]] = {priority: deque() for priority in PRIORITIES}
+        self._deficits: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._queued = 0
+        self._in_flight = 0
+        self._next_slot = 0.0
+        self._stats: Dict[str, _TenantStats] = {}
+        self._other = _TenantStats()
+        threading.Thread(target=self._dispatch, name=f'scheduler-{name}', daemon=True).start()
+
+    @contextmanager
+    def slot(self, tenant: str, priority: str, cost: float = 1.0, max_wait: float = 30):
+        """Wait for this tenant's turn, then hold one of the source's request slots"""
+        ticket = _Ticket(tenant, priority, cost)
+        with self._cond:
+            queue = self._queues[priority].get(tenant)
+            if queue is None:
+                queue = self._queues[priority][tenant] = deque()
+                self._active[priority].append(tenant)
+            queue.append(ticket)
+            self._queued += 1
+            self._cond.notify_all()
+
+        if not ticket.event.wait(max_wait):
+            with self._cond:
+                # The dispatcher may have granted the ticket while the wait timed out
+                if not ticket.granted:
+                    self._remove(ticket)
+                    self._tenant_stats(tenant).timed_out += 1
+                    raise SchedulerTimeout(f"No {self.name} slot for {tenant} within {max_wait}s")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Usage and queueing delay of the busiest tenants plus the source's current load"""
+        with self._cond:
+            queued = self._queued_by_tenant()
+            self._prune_stats(queued)
+            busiest = sorted(self._stats, key=lambda tenant: self._stats[tenant].granted, reverse=True)
+            tenants = {tenant: self._metrics_row(self._stats[tenant], queued.get(tenant, 0))
+                       for tenant in busiest[:self.max_reported]}
+
+            other = _TenantStats()
+            other.add(self._other)
+            for tenant in busiest[self.max_reported:]:
+                other.add(self._stats[tenant])
+            if other.granted or other.timed_out:
+                other_queued = sum(queued.get(tenant, 0) for tenant in busiest[self.max_reported:])
+                tenants[OTHER_TENANTS] = self._metrics_row(other, other_queued)
+            return {'in_flight': self._in_flight, 'queued': self._queued, 'tenants': tenants}
+
+    @staticmethod
+    def _metrics_row(stats: _TenantStats, queued: int) -> Dict[str, Any]:
+        return {
+            'granted': stats.granted,
+            'timed_out': stats.timed_out,
+            'queued': queued,
+            'avg_wait_ms': round(stats.wait_seconds / stats.granted * 1000, 1) if stats.granted else 0.0,
+            'max_wait_ms': round(stats.max_wait_seconds * 1000, 1)
+        }
+
+    def _tenant_stats(self, tenant: str) -> _TenantStats:
+        stats = self._stats.get(tenant)
+        if stats is None:
+            stats = self._stats[tenant] = _TenantStats()
+            if len(self._stats) > self.max_tenants:
+                self._prune_stats(self._queued_by_tenant())
+        stats.last_seen = time.monotonic()
+        return stats
+
+    def _queued_by_tenant(self) -> Dict[str, int]:
+        queued: Dict[str, int] = defaultdict(int)
+        for queues in self._queues.values():
+            for tenant, queue in queues.items():
+                queued[tenant] += len(queue)
+        return queued
+
+    def _prune_stats(self, queued: Dict[str, int]):
+        """Fold idle tenants, and the least recently seen beyond max_tenants, into the other row"""
+        now = time.monotonic()
+        # Tenants with queued requests are kept whatever their age
+        candidates = sorted((tenant for tenant in self._stats if not queued.get(tenant)),
+                            key=lambda tenant: self._stats[tenant].last_seen)
+        excess = len(self._stats) - self.max_tenants
+        for tenant in candidates:
+            if excess <= 0 and now - self._stats[tenant].last_seen <= self.stats_idle:
+                break
+            self._other.add(self._stats.pop(tenant))
+            excess -= 1
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                if not self._queued or self._in_flight >= self.max_in_flight:
+                    self._cond.wait()
+                    continue
+                delay = self._next_slot - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                ticket = self._next_ticket()
+                now = time.monotonic()
+                self._next_slot = max(now, self._next_slot) + self.interval
+                self._in_flight += 1
+                waited = now - ticket.enqueued
+                stats = self._tenant_stats(ticket.tenant)
+                stats.granted += 1
+                stats.wait_seconds += waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+                ticket.granted = True
+                ticket.event.set()
+
+    def _next_ticket(self) -> _Ticket:
+        """Pop the next ticket by priority class, then deficit round-robin over tenants"""
+        for priority in PRIORITIES:
+            active = self._active[priority]
+            while active:
+                tenant = active[0]
+                queue = self._queues[priority][tenant]
+                key = (priority, tenant)
+                if self._deficits[key] >= queue[0].cost:
+                    ticket = queue.popleft()
+                    self._deficits[key] -= ticket.cost
+                    self._queued -= 1
+                    if not queue:
+                        self._drop_tenant(priority, tenant)
+                    return ticket
+                # Out of credit for this round: top up by its weight and let the next tenant go
+                self._deficits[key] += self.quantum * self.weights.get(tenant, 1.0)
+                active.rotate(-1)
+        raise RuntimeError("No queued ticket")
+
+    def _remove(self, ticket: _Ticket):
+        queue = self._queues[ticket.priority].get(ticket.tenant)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            self._queued -= 1
+            if not queue:
+                self._drop_tenant(ticket.priority, ticket.tenant)
+
+    def _drop_tenant(self, priority: str, tenant: str):
+        # An idle tenant does not keep credit for later, as in standard DRR
+        del self._queues[priority][tenant]
+        self._active[priority].remove(tenant)
+        self._deficits.pop((priority, tenant), None)
+
+
+class FairScheduler:
+    """Per-source fair scheduling of upstream requests across tenants
+
+    Endpoints tag their work with tenant(); source adapters wrap each
+    upstream call in slot(source), which queues it behind the source's
+    rate limit in the caller's tenant and priority class.
+    """
+
+    def __init__(self, sources: Dict[str, Dict[str, Any]], weights: Optional[Dict[str, float]] = None,
+                 max_wait: float = 30):
+        self.max_wait = max_wait
+        self.sources = {name: SourceScheduler(name, weights=weights, **options)
+                        for name, options in sources.items()}
+
+    @contextmanager
+    def tenant(self, tenant: str, priority: str = INTERACTIVE):
+        """Run the enclosed work as the given tenant and priority class"""
+        token = _current.set((tenant, priority))
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def slot(self, source: str, cost: float = 1.0):
+        """Hold a request slot of source for the current tenant; unknown sources are not scheduled"""
+        scheduler = self.sources.get(source)
+        if scheduler is None:
+            yield
+            return
+        tenant, priority = _current.get()
+        with scheduler.slot(tenant, priority, cost, self.max_wait):
+            yield
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics of every scheduled source"""
+        return {name: scheduler.metrics() for name, scheduler in self.sources.items()}
+
+
+def tenant_id(api_key: Optional[str], address: Optional[str]) -> str:
+    """Tenant of a request: its API key, hashed so metrics do not expose it, or else the client address"""
+    if api_key:
+        return 'key:' + hashlib.blake2b(api_key.encode('utf-8'), digest_size=6).hexdigest()
+    return 'ip:' + (address or 'unknown')
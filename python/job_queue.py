@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from json_codec import dumps
+from sqlite_db import open_database, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_output', 'jobs.db')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created);
+"""
+
+# A handler gets the job params and a progress(done, total) callback and returns the job result
+JobHandler = Callable[[Dict[str, Any], Callable[[int, int], None]], Any]
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobQueue:
+    """Background job queue persisted in SQLite
+
+    Jobs are stored when submitted and claimed by a bounded pool of worker
+    threads, so long searches do not hold a request worker. Queued jobs
+    survive a restart. Running jobs send a heartbeat; a job whose heartbeat
+    stops (its process died) is queued again. Finished jobs are kept for
+    result_ttl seconds for clients to collect. Several processes can share
+    one database.
+    """
+
+    def __init__(self, handlers: Dict[str, JobHandler], db_path: str = DEFAULT_DB_PATH, workers: int = 2,
+                 result_ttl: float = 3600, max_queued: int = 1000, poll_interval: float = 1.0,
+                 heartbeat_interval: float = 10, stale_after: float = 60):
+        self.handlers = handlers
+        self.db_path = db_path
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._wakeup = threading.Condition()
+        self._running: Dict[str, float] = {}
+        self._running_lock = threading.Lock()
+        self._stop = threading.Event()
+        open_database(db_path, SCHEMA)
+
+    def _transaction(self):
+        """Connection to the queue database, committed on success and then closed"""
+        return transaction(self.db_path, sqlite3.Row)
+
+    def start(self):
+        """Start the worker threads and the maintenance thread"""
+        for number in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True).start()
+        threading.Thread(target=self._maintain, name='job-maintenance', daemon=True).start()
+
+    def stop(self):
+        """Stop claiming new jobs; running jobs finish in the background"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> str:
+        """Queue a job and return its id"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        with self._transaction() as conn:
+            queued = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs are already queued")
+            conn.execute('INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)',
+                         (job_id, kind, dumps(params), QUEUED, time.time()))
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress and (once finished) result of a job, None if unknown or expired"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            position = None
+            if row is not None and row['status'] == QUEUED:
+                position = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?',
+                                        (QUEUED, row['created'])).fetchone()[0]
+        if row is None or (row['finished'] and time.time() - row['finished'] > self.result_ttl):
+            return None
+
+        job = {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': {'done': row['done'], 'total': row['total']},
+            'created': row['created'],
+            'started': row['started'],
+            'finished': row['finished']
+        }
+        if position is not None:
+            job['queue_position'] = position
+        if row['status'] == DONE:
+            job['result'] = json.loads(row['result'])
+            job['expires'] = row['finished'] + self.result_ttl
+        elif row['status'] == FAILED:
+            job['error'] = row['error']
+            job['expires'] = row['finished'] + self.result_ttl
+        return job
+
+    def purge(self) -> int:
+        """Delete finished jobs older than result_ttl and return how many were removed"""
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?',
+                                (DONE, FAILED, time.time() - self.result_ttl)).rowcount
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Atomically move the oldest queued job to running"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Take the write lock up front so two processes cannot claim the same job
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1',
+                               (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE jobs SET status = ?, started = ?, heartbeat = ? WHERE id = ?',
+                         (RUNNING, now, now, row['id']))
+        return row
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Claiming a job failed: {e}")
+                row = None
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(row)
+
+    def _run(self, row: sqlite3.Row):
+        job_id = row['id']
+        with self._running_lock:
+            self._running[job_id] = time.time()
+
+        def progress(done: int, total: int):
+            with self._transaction() as conn:
+                conn.execute('UPDATE jobs SET done = ?, total = ?, heartbeat = ? WHERE id = ?',
+                             (done, total, time.time(), job_id))
+
+        try:
+            result = self.handlers[row['kind']](json.loads(row['params']), progress)
+            update = ('UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ?',
+                      (DONE, dumps(result), time.time(), job_id))
+        except Exception as e:
+            logger.warning(f"Job {job_id} failed: {e}")
+            update = ('UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?',
+                      (FAILED, str(e), time.time(), job_id))
+        finally:
+            with self._running_lock:
+                self._running.pop(job_id, None)
+        with self._transaction() as conn:
+            conn.execute(*update)
+
+    def _maintain(self):
+        """Heartbeat running jobs, requeue jobs of dead workers and purge expired results"""
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                now = time.time()
+                with self._running_lock:
+                    running = list(self._running)
+                with self._transaction() as conn:
+                    conn.executemany('UPDATE jobs SET heartbeat = ? WHERE id = ?',
+                                     [(now, job_id) for job_id in running])
+                    requeued = conn.execute(
+                        'UPDATE jobs SET status = ?, started = NULL WHERE status = ? AND heartbeat < ?',
+                        (QUEUED, RUNNING, now - self.stale_after)).rowcount
+                if requeued:
+                    logger.info(f"Requeued {requeued} jobs of stopped workers")
+                    with self._wakeup:
+                        self._wakeup.notify_all()
+                self.purge()
+            except sqlite3.Error as e:
+                logger.warning(f"Job queue maintenance failed: {e}")
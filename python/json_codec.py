@@ -0,0 +1,84 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, responses are then decoded in one piece
+    ijson = None
+
+
+def encode_json(data: Any, indent: bool = False) -> bytes:
+    """Serialize data to UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # orjson rejects a few types the stdlib accepts (e.g. huge ints)
+            pass
+
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps(data: Any, indent: bool = False) -> str:
+    """Serialize data to a JSON string"""
+    return encode_json(data, indent).decode('utf-8')
+
+
+def iter_array(stream: Any, prefix: str, fields: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Incrementally decode the objects of the JSON array at prefix (e.g. 'message.items')
+
+    Only one element is held in memory at a time. When fields is given,
+    other top-level keys of each element are skipped while parsing
+    instead of being built and thrown away.
+    """
+    item_prefix = prefix + '.item'
+    if fields is None:
+        yield from ijson.items(stream, item_prefix, use_float=True)
+        return
+
+    fields = frozenset(fields)
+    item = key = builder = None
+    for path, event, value in ijson.parse(stream, use_float=True):
+        if path == item_prefix:
+            if event == 'start_map':
+                item = {}
+                continue
+            if event in ('map_key', 'end_map'):
+                if builder is not None:
+                    item[key] = builder.value
+                    builder = None
+                if event == 'end_map':
+                    yield item
+                    item = None
+                else:
+                    key = value
+                    if key in fields:
+                        builder = ijson.ObjectBuilder()
+                continue
+        if builder is not None:
+            builder.event(event, value)
+
+
+def iter_response_items(response: Any, prefix: str,
+                        fields: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the elements of the array at prefix in a streamed requests response
+
+    Falls back to decoding the whole body when ijson is not installed.
+    """
+    if ijson is None:
+        data = response.json()
+        for key in prefix.split('.'):
+            data = data.get(key) or {}
+        yield from data or []
+        return
+
+    # Let urllib3 undo gzip/deflate so ijson sees the JSON text
+    response.raw.decode_content = True
+    yield from iter_array(response.raw, prefix, fields)
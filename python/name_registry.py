@@ -0,0 +1,210 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from suggest_index import normalize
+
+
+def normalize_name(name: str) -> str:
+    """Comparable form of an author or venue name
+
+    Case, accents and punctuation are dropped and "Family, Given" is turned
+    into "given family", the order Crossref, arXiv and OpenAlex names end
+    up in.
+    """
+    if name.count(',') == 1:
+        family, given = name.split(',')
+        name = f"{given} {family}"
+    text = unicodedata.normalize('NFKD', name)
+    return normalize(''.join(char for char in text if not unicodedata.combining(char)))
+
+
+class _Vocabulary:
+    """Normalized names of one kind, numbered in order of first appearance
+
+    A name is dropped once no registered paper carries it; its id is not
+    reused.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.keys: Dict[int, str] = {}
+        self.names: Dict[int, str] = {}
+        # Name id -> ids of the registered papers carrying it
+        self.papers: Dict[int, Set[str]] = {}
+        self._next_id = 0
+
+    def intern(self, key: str, name: str) -> int:
+        name_id = self.ids.get(key)
+        if name_id is None:
+            name_id = self.ids[key] = self._next_id
+            self._next_id += 1
+            self.keys[name_id] = key
+            self.names[name_id] = name
+            self.papers[name_id] = set()
+        return name_id
+
+    def remove_paper(self, name_id: int, paper_id: str) -> Optional[str]:
+        """Unlink a paper from a name; returns the name's key if that dropped it"""
+        papers = self.papers[name_id]
+        papers.discard(paper_id)
+        if papers:
+            return None
+        del self.papers[name_id]
+        del self.names[name_id]
+        key = self.keys.pop(name_id)
+        del self.ids[key]
+        return key
+
+
+class NameRegistry:
+    """Process-wide registry of author and venue names
+
+    Names are normalized and numbered, and each number maps to the papers
+    carrying the name, so results can be filtered by author or venue with
+    one set lookup per paper. Registering a paper also replaces its name
+    strings with one shared copy of each spelling, so the many cached
+    results listing the same authors do not each hold their own strings.
+
+    At most max_papers papers are kept, the least recently registered
+    being forgotten first. Names and spellings only live as long as a
+    registered paper carries them, so the registry stays bounded too.
+    """
+
+    def __init__(self, max_papers: int = 200000):
+        self.max_papers = max_papers
+        self._authors = _Vocabulary()
+        self._venues = _Vocabulary()
+        # Family names resolve an author filter given as just "Hinton"
+        self._families: Dict[str, Set[int]] = {}
+        # Shared copy of each spelling and the number of registered papers using it
+        self._spellings: Dict[str, str] = {}
+        self._spelling_refs: Dict[str, int] = {}
+        # Paper id -> (author ids, venue id, spellings)
+        self._papers: 'OrderedDict[str, Tuple[Tuple[int, ...], Optional[int], Tuple[str, ...]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_papers(self, papers: Iterable[Dict[str, Any]]):
+        """Register papers and make their name strings shared copies"""
+        with self._lock:
+            for paper in papers:
+                self._register(paper)
+
+    def filter(self, papers: List[Dict[str, Any]], author: Optional[str] = None,
+               venue: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Papers that list the author and appeared in the venue; papers not seen before are registered"""
+        with self._lock:
+            for paper in papers:
+                # Results from outside the service's caches, e.g. the arXiv mirror, are new here
+                if paper.get('id') not in self._papers:
+                    self._register(paper)
+
+            wanted = []
+            if author:
+                wanted.append(self._author_papers(author))
+            if venue:
+                venue_id = self._venues.ids.get(normalize_name(venue))
+                wanted.append(self._venues.papers[venue_id] if venue_id is not None else set())
+            if not wanted:
+                return papers
+
+            return [paper for paper in papers
+                    if paper.get('id') and all(paper['id'] in matching for matching in wanted)]
+
+    def author_id(self, name: str) -> Optional[int]:
+        """Id of an author name, None if no registered paper carries it"""
+        return self._authors.ids.get(normalize_name(name))
+
+    def venue_id(self, name: str) -> Optional[int]:
+        """Id of a venue name, None if no registered paper carries it"""
+        return self._venues.ids.get(normalize_name(name))
+
+    def stats(self) -> Dict[str, int]:
+        """Numbers of distinct authors, venues and spellings, and of registered papers"""
+        with self._lock:
+            return {'authors': len(self._authors.names), 'venues': len(self._venues.names),
+                    'spellings': len(self._spellings), 'papers': len(self._papers)}
+
+    def _author_papers(self, author: str) -> Set[str]:
+        """Papers of an author given by full name or, failing that, family name only"""
+        author_id = self._authors.ids.get(normalize_name(author))
+        if author_id is not None:
+            return self._authors.papers[author_id]
+        matching: Set[str] = set()
+        for author_id in self._families.get(normalize_name(author), ()):
+            matching |= self._authors.papers[author_id]
+        return matching
+
+    def _share(self, name: str) -> str:
+        """Shared copy of a spelling, counted as used by one more paper"""
+        shared = self._spellings.setdefault(name, name)
+        self._spelling_refs[shared] = self._spelling_refs.get(shared, 0) + 1
+        return shared
+
+    def _register(self, paper: Dict[str, Any]):
+        authors = [author for author in paper.get('authors') or [] if isinstance(author, str)]
+        venue = paper.get('journal')
+        if not (isinstance(venue, str) and venue):
+            venue = None
+
+        paper_id = paper.get('id')
+        if not paper_id:
+            # Papers without an id are never forgotten, they may only reuse known spellings
+            if authors:
+                paper['authors'] = [self._spellings.get(author, author) for author in authors]
+            if venue:
+                paper['journal'] = self._spellings.get(venue, venue)
+            return
+        self._forget(paper_id)
+
+        authors = [self._share(author) for author in authors]
+        if authors:
+            paper['authors'] = authors
+        if venue:
+            paper['journal'] = venue = self._share(venue)
+        spellings = tuple(authors) + ((venue,) if venue else ())
+
+        author_ids = []
+        for author in authors:
+            key = normalize_name(author)
+            if not key:
+                continue
+            author_id = self._authors.intern(key, author)
+            self._families.setdefault(self._family(key), set()).add(author_id)
+            self._authors.papers[author_id].add(paper_id)
+            author_ids.append(author_id)
+        venue_id = None
+        key = normalize_name(venue) if venue else ''
+        if key:
+            venue_id = self._venues.intern(key, venue)
+            self._venues.papers[venue_id].add(paper_id)
+
+        self._papers[paper_id] = (tuple(author_ids), venue_id, spellings)
+        while len(self._papers) > self.max_papers:
+            self._forget(next(iter(self._papers)))
+
+    def _forget(self, paper_id: str):
+        """Drop a paper, and the names and spellings only it used"""
+        known = self._papers.pop(paper_id, None)
+        if known is None:
+            return
+        author_ids, venue_id, spellings = known
+        for author_id in set(author_ids):
+            key = self._authors.remove_paper(author_id, paper_id)
+            if key is not None:
+                family = self._families[self._family(key)]
+                family.discard(author_id)
+                if not family:
+                    del self._families[self._family(key)]
+        if venue_id is not None:
+            self._venues.remove_paper(venue_id, paper_id)
+        for spelling in spellings:
+            self._spelling_refs[spelling] -= 1
+            if not self._spelling_refs[spelling]:
+                del self._spelling_refs[spelling]
+                del self._spellings[spelling]
+
+    @staticmethod
+    def _family(key: str) -> str:
+        return key.rsplit(' ', 1)[-1]
@@ -0,0 +1,303 @@
+import logging
+import os
+from itertools import islice
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from arxiv_mirror import get_mirror
+from enrichment import PaperEnricher
+from fair_scheduler import FairScheduler, SchedulerTimeout
+from json_codec import iter_response_items
+from name_registry import NameRegistry
+from reranker import PaperReranker
+from search_cache import CacheEntry, SearchCache
+from source_cache import SourceCache
+from suggest_index import SuggestIndex
+
+logger = logging.getLogger(__name__)
+
+# Base URLs of the upstream APIs, warmed up at startup
+UPSTREAM_URLS = ['https://api.openalex.org/', 'http://export.arxiv.org/']
+
+# Upstream request budgets, shared fairly between tenants (arXiv asks for one request per 3 seconds)
+SOURCE_LIMITS = {
+    'openalex': {'rate': 10, 'max_in_flight': 8},
+    'arxiv': {'rate': 1 / 3, 'max_in_flight': 1}
+}
+
+# Top-level OpenAlex fields results are built from; only these are requested and parsed
+OPENALEX_FIELDS = ('id', 'title', 'authorships', 'abstract_inverted_index', 'publication_year',
+                   'primary_location', 'doi', 'cited_by_count')
+
+
+class PaperSearchService:
+    """Paper search over OpenAlex with an arXiv fallback
+
+    Sources are tried in the order of SOURCES until one succeeds; services
+    adding a source extend SOURCES and _fetchers.
+    """
+    
+    SOURCES = ('openalex', 'arxiv')
+    
+    def __init__(self):
+        self.cache_duration = 3600  # 1 hour
+        self.cache = SearchCache(self.cache_duration, jitter=0.1)
+        # Single-source responses, failures included, cached below the merged result;
+        # waiting too long for a local scheduler slot says nothing about the source
+        self.source_cache = SourceCache(self.cache_duration, uncacheable=(SchedulerTimeout,))
+        # One session for every upstream so connections opened during warmup are reused
+        self.session = requests.Session()
+        self.scheduler = FairScheduler(SOURCE_LIMITS)
+        self.enricher = PaperEnricher(session=self.session, scheduler=self.scheduler)
+        # Relevance re-ranking of upstream results is opt-in
+        self.reranker = PaperReranker() if os.environ.get('SEARCH_RERANK') == '1' else None
+        # Author and venue names of returned papers, shared across cached results and used for filtering
+        self.names = NameRegistry()
+        # Typeahead suggestions are learned from the papers and queries the service answers
+        self.suggest_index = SuggestIndex()
+        self.suggest_index.start()
+    
+    def search_papers(self, query: str, limit: int = 10) -> Dict[str, Any]:
+        """Search for papers using multiple sources with fallbacks"""
+        return self.search_entry(query, limit).data
+    
+    def search_entry(self, query: str, limit: int = 10, refresh: bool = False) -> CacheEntry:
+        """Search for papers and return the result with its serialized bytes
+        
+        With refresh=True the cache is bypassed and the result re-fetched.
+        """
+        
+        # Check cache first, a larger cached result answers smaller limits
+        cached_entry, partial_entry = (None, None) if refresh else self.cache.lookup(query, limit)
+        if cached_entry is not None:
+            logger.info(f"Returning cached results for: {query}")
+            return cached_entry
+        
+        # A smaller cached result only needs the missing tail fetched
+        if partial_entry is not None:
+            topped_up = self._top_up(query, limit, partial_entry)
+            if topped_up is not None:
+                logger.info(f"Topped up cached results for: {query}")
+                return topped_up
+        
+        for source in self.SOURCES:
+            try:
+                result, fetched_at = self._fetch_source(source, query, limit, refresh=refresh)
+                if result['success']:
+                    return self._cache_result(query, limit, result, fetched_at)
+            except Exception as e:
+                logger.warning(f"{source} failed: {e}")
+        
+        # If all methods fail, return error with suggestions
+        return CacheEntry({
+            'success': False,
+            'error': 'All search methods failed',
+            'suggestions': [
+                'Check your internet connection',
+                'Try more specific search terms',
+                'Verify search services are available'
+            ],
+            'papers': []
+        })
+    
+    def degraded_entry(self, query: str, limit: int) -> Optional[CacheEntry]:
+        """Answer a request shed under load from local data only
+        
+        A cached result is used even if expired or shorter than limit, else
+        the local arXiv mirror is searched. None if neither has papers.
+        """
+        cached = self.cache.peek(query)
+        if cached is not None and cached.data.get('success') and cached.data.get('papers'):
+            papers = cached.data['papers'][:limit]
+            return CacheEntry(dict(cached.data, papers=papers, count=len(papers), degraded=True),
+                              timestamp=cached.timestamp)
+        
+        mirror = get_mirror()
+        if mirror is not None:
+            try:
+                papers = mirror.search(query, limit)
+            except Exception as e:
+                logger.warning(f"arXiv mirror search failed: {e}")
+                papers = []
+            if papers:
+                return CacheEntry({
+                    'success': True,
+                    'source': 'arxiv_mirror',
+                    'count': len(papers),
+                    'papers': papers,
+                    'degraded': True
+                })
+        return None
+    
+    def _top_up(self, query: str, limit: int, partial_entry: CacheEntry) -> Optional[CacheEntry]:
+        """Extend a smaller cached result by fetching only the papers it is missing"""
+        source = partial_entry.data.get('source')
+        if source not in ('openalex', 'arxiv'):
+            return None
+        
+        cached_papers = partial_entry.data['papers']
+        try:
+            tail, _ = self._fetch_source(source, query, limit - len(cached_papers), len(cached_papers))
+        except Exception as e:
+            logger.warning(f"Top-up failed: {e}")
+            return None
+        
+        seen_ids = {paper['id'] for paper in cached_papers}
+        papers = cached_papers + [paper for paper in tail['papers'] if paper['id'] not in seen_ids]
+        self.names.add_papers(tail['papers'])
+        self.suggest_index.add_papers(tail['papers'])
+        result = self._rank(query, dict(partial_entry.data, papers=papers, count=len(papers)))
+        # The head of the result is as old as the partial entry, so keep its timestamp
+        return self.cache.store(query, limit, result, partial_entry.timestamp)
+    
+    def _search_with_openalex(self, query: str, limit: int, offset: int = 0) -> Dict[str, Any]:
+        """Search using OpenAlex API"""
+        try:
+            # OpenAlex pages by page number, so pick a page size that lands on the offset
+            page_size = limit
+            if offset:
+                page_size = next((size for size in range(limit, offset + 1) if offset % size == 0),
+                                 offset + limit)
+            skip = offset % page_size
+            
+            url = "https://api.openalex.org/works"
+            params = {
+                'search': query,
+                'per-page': page_size,
+                'page': offset // page_size + 1,
+                'select': ','.join(OPENALEX_FIELDS),
+                'mailto': 'research@example.com'
+            }
+            
+            # Results are decoded one work at a time and only the requested slice is built
+            with self.scheduler.slot('openalex'), \
+                    self.session.get(url, params=params, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                
+                papers = []
+                works = iter_response_items(response, 'results', OPENALEX_FIELDS)
+                for work in islice(works, skip, skip + limit):
+                    paper = {
+                        'id': work.get('id', ''),
+                        'title': work.get('title', 'No title'),
+                        'authors': [(authorship.get('author') or {}).get('display_name', '')
+                                    for authorship in work.get('authorships') or []],
+                        'abstract': self._get_abstract_from_inverted(work.get('abstract_inverted_index', {})),
+                        'year': work.get('publication_year', ''),
+                        'journal': ((work.get('primary_location') or {}).get('source') or {}).get('display_name', ''),
+                        'url': work.get('doi', work.get('id', '')),
+                        'citations': work.get('cited_by_count', 0),
+                        'source': 'openalex'
+                    }
+                    papers.append(paper)
+            
+            return {
+                'success': True,
+                'source': 'openalex',
+                'count': len(papers),
+                'papers': papers
+            }
+            
+        except Exception as e:
+            raise Exception(f"OpenAlex search failed: {str(e)}")
+    
+    def _search_with_arxiv(self, query: str, limit: int, offset: int = 0) -> Dict[str, Any]:
+        """Search using arXiv API"""
+        try:
+            import xml.etree.ElementTree as ET
+            
+            url = "http://export.arxiv.org/api/query"
+            params = {
+                'search_query': f'all:{query}',
+                'start': offset,
+                'max_results': limit
+            }
+            
+            with self.scheduler.slot('arxiv'):
+                response = self.session.get(url, params=params, timeout=30)
+            response.raise_for_status()
+            
+            root = ET.fromstring(response.content)
+            namespace = {'atom': 'http://www.w3.org/2005/Atom'}
+            
+            papers = []
+            for entry in root.findall('atom:entry', namespace):
+                title = entry.find('atom:title', namespace)
+                summary = entry.find('atom:summary', namespace)
+                published = entry.find('atom:published', namespace)
+                
+                authors = []
+                for author in entry.findall('atom:author', namespace):
+                    name = author.find('atom:name', namespace)
+                    if name is not None:
+                        authors.append(name.text)
+                
+                paper = {
+                    'id': entry.find('atom:id', namespace).text if entry.find('atom:id', namespace) is not None else '',
+                    'title': title.text if title is not None else 'No title',
+                    'authors': authors,
+                    'abstract': summary.text if summary is not None else 'No abstract',
+                    'year': published.text[:4] if published is not None else '',
+                    'journal': 'arXiv',
+                    'url': entry.find('atom:id', namespace).text if entry.find('atom:id', namespace) is not None else '',
+                    'citations': 0,
+                    'source': 'arxiv'
+                }
+                papers.append(paper)
+            
+            # arXiv has no citation counts, fill them and venues in one batched lookup
+            self.enricher.enrich(papers)
+            
+            return {
+                'success': True,
+                'source': 'arxiv',
+                'count': len(papers),
+                'papers': papers
+            }
+            
+        except Exception as e:
+            raise Exception(f"arXiv search failed: {str(e)}")
+    
+    def _get_abstract_from_inverted(self, inverted_index: Dict) -> str:
+        """Convert OpenAlex inverted index to readable abstract"""
+        if not inverted_index:
+            return "No abstract available"
+        
+        try:
+            words = {}
+            for word, positions in inverted_index.items():
+                for pos in positions:
+                    words[pos] = word
+            
+            sorted_positions = sorted(words.keys())
+            return ' '.join(words[pos] for pos in sorted_positions)
+        except:
+            return "Abstract processing failed"
+    
+    def _rank(self, query: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-rank result papers by relevance when re-ranking is enabled"""
+        if self.reranker is not None:
+            result['papers'] = self.reranker.rerank(query, result['papers'])
+        return result
+    
+    def _fetch_source(self, source: str, query: str, limit: int, offset: int = 0,
+                      refresh: bool = False) -> Tuple[Dict[str, Any], float]:
+        """Fetch one page of one source through the per-source cache, returning it with its fetch time"""
+        fetchers = self._fetchers(query, limit, offset)
+        return self.source_cache.fetch(source, query, (offset, limit), fetchers[source], refresh)
+    
+    def _fetchers(self, query: str, limit: int, offset: int) -> Dict[str, Callable[[], Dict[str, Any]]]:
+        """Calls fetching one page of each source"""
+        return {
+            'openalex': lambda: self._search_with_openalex(query, limit, offset),
+            'arxiv': lambda: self._search_with_arxiv(query, limit, offset)
+        }
+    
+    def _cache_result(self, query: str, limit: int, result: Dict[str, Any],
+                      timestamp: Optional[float] = None) -> CacheEntry:
+        """Cache search result along with its encoded response body"""
+        self.names.add_papers(result['papers'])
+        self.suggest_index.add_papers(result['papers'])
+        # A result rebuilt from a cached source response is only as fresh as that response
+        return self.cache.store(query, limit, self._rank(query, result), timestamp)
@@ -0,0 +1,348 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from json_codec import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_output', 'pdfs')
+CHUNK_SIZE = 64 * 1024
+
+
+class PipelineMetrics:
+    """Thread-safe counters for the PDF pipeline"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.resumed = 0
+        self.bytes_downloaded = 0
+        self.download_seconds = 0.0
+        self.extracted = 0
+        self.extract_seconds = 0.0
+
+    def add(self, **counts):
+        """Increment counters by name"""
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters plus derived throughput figures"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                'downloaded': self.downloaded,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'resumed': self.resumed,
+                'bytes_downloaded': self.bytes_downloaded,
+                'extracted': self.extracted,
+                'elapsed_seconds': round(elapsed, 3),
+                'download_mb_per_second': round(self.bytes_downloaded / 1e6 / elapsed, 3) if elapsed else 0.0,
+                'pdfs_per_second': round(self.downloaded / elapsed, 3) if elapsed else 0.0,
+                'avg_extract_seconds': round(self.extract_seconds / self.extracted, 3) if self.extracted else 0.0
+            }
+
+
+class PdfStore:
+    """Content-addressed PDF store on disk
+
+    PDFs live under <root>/<sha256[:2]>/<sha256>.pdf with extracted text
+    next to them. url_index.json maps source URLs to hashes so known PDFs
+    are not downloaded again, and partial downloads are kept in <root>/partial
+    with the ETag or Last-Modified of their response, so they can be
+    resumed only while the remote file is unchanged.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        self.partial_dir = os.path.join(root, 'partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._index_path = os.path.join(root, 'url_index.json')
+        self._lock = threading.Lock()
+        self._index: Dict[str, str] = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+
+    def path_for(self, digest: str, suffix: str = '.pdf') -> str:
+        """Location of a stored file by content hash"""
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def partial_path(self, url: str) -> str:
+        """Location of the in-progress download for a URL"""
+        return os.path.join(self.partial_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    @staticmethod
+    def validator_path(partial_path: str) -> str:
+        """Location of the validator (ETag or Last-Modified) a partial download was started with"""
+        return partial_path + '.validator'
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Hash of the stored PDF for a URL, if it is still on disk"""
+        with self._lock:
+            digest = self._index.get(url)
+        if digest and os.path.exists(self.path_for(digest)):
+            return digest
+        return None
+
+    def commit(self, url: str, partial_path: str, digest: str):
+        """Move a finished download into place and record its URL"""
+        final_path = self.path_for(digest)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if os.path.exists(final_path):
+            # Same content reached through another URL
+            os.remove(partial_path)
+        else:
+            os.replace(partial_path, final_path)
+        if os.path.exists(self.validator_path(partial_path)):
+            os.remove(self.validator_path(partial_path))
+
+        with self._lock:
+            self._index[url] = digest
+            temp_path = self._index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self._index_path)
+
+
+def extract_text(pdf_path: str, text_path: str) -> int:
+    """Extract the text of a PDF into text_path and return its length
+
+    Runs in a worker process. The PDF is memory-mapped rather than read
+    into memory.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+    with open(pdf_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            reader = PdfReader(mapped)
+            text = '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return len(text)
+
+
+class PdfPipeline:
+    """Concurrent PDF download and text extraction stage
+
+    Downloads run in a thread pool with at most per_host_limit requests to
+    any one host. Bodies are streamed to disk chunk by chunk while being
+    hashed, so memory use does not depend on PDF size; an interrupted
+    download continues from where it stopped with an HTTP Range request.
+    Text extraction runs in a process pool over the stored files.
+    """
+
+    def __init__(self, store: Optional[PdfStore] = None, max_workers: int = 8, per_host_limit: int = 2,
+                 extract_workers: Optional[int] = None, timeout: float = 60,
+                 session: Optional[requests.Session] = None):
+        self.store = store or PdfStore()
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.extract_workers = extract_workers
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.metrics = PipelineMetrics()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(self.per_host_limit))
+        self._host_lock = threading.Lock()
+
+    def run(self, papers: List[Dict[str, Any]], extract: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Fetch and extract the PDFs of papers that have a pdf_url
+
+        Returns a dict keyed by paper id with the content hash, the stored
+        PDF and text paths, or the error that stopped the paper.
+        """
+        # Papers sharing a PDF URL share one download
+        url_to_ids: Dict[str, List[str]] = defaultdict(list)
+        for paper in papers:
+            if paper.get('pdf_url'):
+                url_to_ids[paper['pdf_url']].append(paper.get('id') or paper['pdf_url'])
+
+        url_results: Dict[str, Dict[str, Any]] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_url = {executor.submit(self.fetch, url): url for url in url_to_ids}
+            for future in concurrent.futures.as_completed(future_to_url):
+                url = future_to_url[future]
+                try:
+                    digest = future.result()
+                    url_results[url] = {'sha256': digest, 'pdf_path': self.store.path_for(digest)}
+                except Exception as e:
+                    logger.warning(f"PDF download failed for {url}: {e}")
+                    url_results[url] = {'error': str(e)}
+
+        if extract:
+            # Identical content fetched through different URLs is extracted once
+            by_digest = {result['sha256']: result for result in url_results.values() if 'sha256' in result}
+            self.extract(list(by_digest.values()))
+            for result in url_results.values():
+                if 'sha256' in result:
+                    result.update(by_digest[result['sha256']])
+
+        return {paper_id: url_results[url] for url, ids in url_to_ids.items() for paper_id in ids}
+
+    def fetch(self, url: str) -> str:
+        """Download a PDF into the store unless it is already there and return its hash"""
+        digest = self.store.lookup(url)
+        if digest:
+            self.metrics.add(skipped=1)
+            return digest
+
+        with self._host_slot(url):
+            try:
+                digest = self._download(url)
+            except Exception:
+                self.metrics.add(failed=1)
+                raise
+        self.metrics.add(downloaded=1)
+        return digest
+
+    def fetch_range(self, url: str, start: int, end: int) -> bytes:
+        """Fetch bytes start..end (inclusive) of a remote file, e.g. to sniff a header"""
+        with self._host_slot(url), self.session.get(url, headers={'Range': f'bytes={start}-{end}'},
+                                                    stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code == 206:
+                return response.raw.read(end - start + 1, decode_content=True)
+
+            # The server ignored the range, read up to the requested bytes ourselves
+            data = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                data += chunk
+                if len(data) > end:
+                    break
+            return bytes(data[start:end + 1])
+
+    def extract(self, results: List[Dict[str, Any]]):
+        """Extract text for downloaded PDFs that have none yet, in a process pool"""
+        pending = []
+        for result in results:
+            text_path = self.store.path_for(result['sha256'], '.txt')
+            result['text_path'] = text_path
+            if not os.path.exists(text_path):
+                pending.append(result)
+        if not pending:
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.extract_workers) as executor:
+            start_time = time.time()
+            future_to_result = {
+                executor.submit(extract_text, result['pdf_path'], result['text_path']): result
+                for result in pending
+            }
+            for future in concurrent.futures.as_completed(future_to_result):
+                result = future_to_result[future]
+                try:
+                    result['text_length'] = future.result()
+                    self.metrics.add(extracted=1)
+                except Exception as e:
+                    logger.warning(f"Text extraction failed for {result['pdf_path']}: {e}")
+                    result.pop('text_path', None)
+                    result['extract_error'] = str(e)
+            self.metrics.add(extract_seconds=time.time() - start_time)
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            return self._host_slots[host]
+
+    def _download(self, url: str) -> str:
+        """Stream a URL into a partial file, resuming a previous attempt when possible"""
+        partial_path = self.store.partial_path(url)
+        validator_path = self.store.validator_path(partial_path)
+        hasher = hashlib.sha256()
+        offset = 0
+        headers = {}
+        # Without a validator the partial file may be from another version of the file, start over
+        if os.path.exists(partial_path) and os.path.exists(validator_path):
+            with open(validator_path, 'r', encoding='utf-8') as f:
+                validator = f.read().strip()
+            if validator:
+                offset = os.path.getsize(partial_path)
+                # If-Range makes a server whose file changed send all of it (200) instead of the range
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validator
+
+        start_time = time.time()
+        received = 0
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            # 416 on a resume means the partial file already holds the whole body
+            complete = offset > 0 and response.status_code == 416
+            if not complete:
+                response.raise_for_status()
+            resuming = offset > 0 and response.status_code == 206
+
+            if complete or resuming:
+                self.metrics.add(resumed=1)
+                with open(partial_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+
+            if not complete:
+                if not resuming:
+                    self._save_validator(validator_path, response)
+                with open(partial_path, 'ab' if resuming else 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        received += len(chunk)
+
+        self.metrics.add(bytes_downloaded=received, download_seconds=time.time() - start_time)
+        digest = hasher.hexdigest()
+        self.store.commit(url, partial_path, digest)
+        return digest
+
+    @staticmethod
+    def _save_validator(validator_path: str, response: requests.Response):
+        """Keep what a resumed download sends as If-Range; weak ETags cannot be used for ranges"""
+        etag = response.headers.get('ETag', '')
+        validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified', '')
+        if validator:
+            with open(validator_path, 'w', encoding='utf-8') as f:
+                f.write(validator)
+        elif os.path.exists(validator_path):
+            os.remove(validator_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download and extract the PDFs of papers, e.g. from `python search_papers.py <query>`")
+    parser.add_argument('papers', nargs='?', help="JSON file with a list of papers (default: stdin)")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Directory of the PDF store")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent downloads")
+    parser.add_argument('--per-host', type=int, default=2, help="Concurrent downloads per host")
+    parser.add_argument('--no-extract', action='store_true', help="Only download, skip text extraction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.papers:
+        with open(args.papers, 'r', encoding='utf-8') as f:
+            papers = json.load(f)
+    else:
+        papers = json.load(sys.stdin)
+
+    pipeline = PdfPipeline(PdfStore(args.store), args.workers, args.per_host)
+    results = pipeline.run(papers, extract=not args.no_extract)
+    print(dumps(results, indent=True))
+    print(dumps(pipeline.metrics.snapshot()), file=sys.stderr)
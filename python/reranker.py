@@ -0,0 +1,153 @@
+import math
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# numpy is imported on first use to keep it off the startup path
+np = None
+
+
+def _load_numpy():
+    """Import numpy on first use; it is optional and results keep their order without it"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+_TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is it of on or that the this to with we our using via'.split()
+)
+
+
+class PaperReranker:
+    """Relevance re-ranking of search results on CPU
+
+    Titles and abstracts are turned into hashed term-frequency vectors
+    (unigrams plus title bigrams, title terms weighted up) that are cached
+    per paper id. A query scores the whole candidate set at once: the
+    cached vectors are scattered into one dense matrix, weighted by IDF
+    computed over the candidates, and multiplied with the query vector.
+    """
+
+    def __init__(self, dimensions: int = 1 << 12, title_weight: float = 2.0,
+                 citation_weight: float = 0.1, cache_size: int = 50000):
+        self.dimensions = dimensions
+        self.title_weight = title_weight
+        self.citation_weight = citation_weight
+        self.cache_size = cache_size
+        self._vectors: 'OrderedDict[str, Tuple[Any, Any]]' = OrderedDict()
+        self._buckets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether numpy is installed and re-ranking can run"""
+        return _load_numpy() is not None
+
+    def rerank(self, query: str, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return papers ordered by relevance to query, most relevant first"""
+        if _load_numpy() is None or len(papers) < 2:
+            return papers
+
+        query_terms = self._terms(query)
+        if not query_terms:
+            return papers
+        query_indices, query_values = self._sparse(query_terms)
+
+        vectors = [self._vector(paper) for paper in papers]
+        rows = np.repeat(np.arange(len(papers)), [len(indices) for indices, _ in vectors])
+        if not rows.size:
+            return papers
+
+        # Only the hash buckets the candidates use become matrix columns
+        buckets, columns = np.unique(np.concatenate([indices for indices, _ in vectors]), return_inverse=True)
+        matrix = np.zeros((len(papers), len(buckets)), dtype=np.float32)
+        matrix[rows, columns] = np.concatenate([values for _, values in vectors])
+
+        # Sublinear TF and IDF over the candidate set, then cosine similarity
+        np.log1p(matrix, out=matrix)
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((1 + len(papers)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1
+
+        positions = np.minimum(np.searchsorted(buckets, query_indices), len(buckets) - 1)
+        present = buckets[positions] == query_indices
+        # Query terms no candidate contains get the highest IDF; they only affect the query norm
+        query_weights = np.log1p(query_values) * np.where(present, idf[positions], math.log(1 + len(papers)) + 1)
+        query_vector = np.zeros(len(buckets), dtype=np.float32)
+        query_vector[positions[present]] = query_weights[present]
+        query_norm = np.linalg.norm(query_weights) or 1
+        scores = (matrix @ query_vector) / (norms * query_norm)
+
+        if self.citation_weight:
+            citations = np.array([float(paper.get('citations') or 0) for paper in papers], dtype=np.float32)
+            citations = np.log1p(citations)
+            if citations.max() > 0:
+                scores += self.citation_weight * citations / citations.max()
+
+        # Stable sort keeps upstream order among equally scored papers
+        order = np.argsort(-scores, kind='stable')
+        return [papers[i] for i in order]
+
+    def _vector(self, paper: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Cached sparse term vector of a paper"""
+        key = paper.get('id') or paper.get('url') or paper.get('title') or ''
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                return vector
+
+        title_terms = self._terms(paper.get('title') or '')
+        terms = {}
+        for term in title_terms:
+            terms[term] = terms.get(term, 0) + self.title_weight
+        for first, second in zip(title_terms, title_terms[1:]):
+            bigram = f"{first} {second}"
+            terms[bigram] = terms.get(bigram, 0) + self.title_weight
+        for term in self._terms(paper.get('abstract') or ''):
+            terms[term] = terms.get(term, 0) + 1
+        vector = self._sparse_counts(terms)
+
+        with self._lock:
+            self._vectors[key] = vector
+            if len(self._vectors) > self.cache_size:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _terms(self, text: str) -> List[str]:
+        """Lower-cased word tokens without stopwords"""
+        return [token for token in _TOKEN.findall(text.casefold()) if token not in _STOPWORDS]
+
+    def _sparse(self, terms: List[str]) -> Tuple[Any, Any]:
+        """Sparse vector of query terms plus their bigrams"""
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for first, second in zip(terms, terms[1:]):
+            bigram = f"{first} {second}"
+            counts[bigram] = counts.get(bigram, 0) + 1
+        return self._sparse_counts(counts)
+
+    def _sparse_counts(self, counts: Dict[str, float]) -> Tuple[Any, Any]:
+        """Hash term counts into (indices, values) arrays with unique indices"""
+        buckets = {}
+        for term, count in counts.items():
+            bucket = self._buckets.get(term)
+            if bucket is None:
+                bucket = zlib.crc32(term.encode('utf-8')) % self.dimensions
+                if len(self._buckets) < 200000:
+                    self._buckets[term] = bucket
+            buckets[bucket] = buckets.get(bucket, 0) + count
+        indices = np.fromiter(buckets.keys(), dtype=np.int32, count=len(buckets))
+        values = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+        return indices, values
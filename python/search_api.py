@@ -0,0 +1,298 @@
+import logging
+import time
+from typing import Any, Dict
+
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, url_for
+
+from admission import AdmissionController, Overloaded
+from cache_warmer import CacheWarmer
+from citation_graph import DIRECTIONS, CitationGraph
+from fair_scheduler import BACKGROUND, INTERACTIVE, tenant_id
+from job_queue import DONE, FAILED, JobQueue, QueueFull
+from json_codec import dumps, encode_json
+from paper_search_service import UPSTREAM_URLS, PaperSearchService
+from search_cache import CacheEntry, json_response, parse_fields
+from warmup import Prewarmer
+
+logger = logging.getLogger(__name__)
+
+# Long searches (many queries, deep result lists) run as background jobs instead of holding a request worker
+MAX_JOB_QUERIES = 100
+MAX_JOB_LIMIT = 200
+JOB_STREAM_SECONDS = 60
+
+MAX_GRAPH_DEPTH = 3
+MAX_GRAPH_NODES = 5000
+
+# Upper bound of the suggest endpoint's limit parameter
+MAX_SUGGESTIONS = 20
+
+search_api = Blueprint('search_api', __name__)
+
+
+class SearchApi:
+    """Background machinery behind the search endpoints of one app
+
+    Cache warming, startup warmup, the search job queue, citation graph
+    expansion and admission control all work on the app's search service.
+    """
+
+    def __init__(self, search_service: PaperSearchService, jobs_db_path: str, job_workers: int = 2):
+        self.search_service = search_service
+        self.cache_warmer = CacheWarmer(search_service)
+        # Resolve upstream hosts and open connections before the first request needs them
+        self.prewarmer = Prewarmer(search_service.session, UPSTREAM_URLS,
+                                   modules=['numpy'] if search_service.reranker is not None else None)
+        self.job_queue = JobQueue({'search': self.run_search_job}, jobs_db_path, workers=job_workers)
+        # Citation graph expansion shares the session and the OpenAlex budget of the search service
+        self.citation_graph = CitationGraph(search_service.session, scheduler=search_service.scheduler)
+        # Live searches beyond what the upstreams currently sustain are shed instead of piling up threads
+        self.admission = AdmissionController()
+
+    def start(self):
+        """Start cache warming, startup warmup and the job workers"""
+        self.cache_warmer.start()
+        self.prewarmer.start()
+        self.job_queue.start()
+
+    def run_search_job(self, params: Dict[str, Any], progress) -> Dict[str, Any]:
+        """Search every query of a job, reporting progress after each"""
+        queries = params['queries']
+        progress(0, len(queries))
+        results = []
+        for done, query in enumerate(queries, 1):
+            with self.cache_warmer.live_request(), self.search_service.scheduler.tenant(params['tenant'], BACKGROUND):
+                entry = self.search_service.search_entry(query, params['limit'])
+            results.append(dict(entry.data, query=query))
+            progress(done, len(queries))
+        return {'results': results}
+
+
+def init_search_api(app: Flask, search_service: PaperSearchService, jobs_db_path: str,
+                    job_workers: int = 2) -> SearchApi:
+    """Start the search machinery for app and register the search endpoints on it"""
+    api = SearchApi(search_service, jobs_db_path, job_workers)
+    api.start()
+    app.extensions['search_api'] = api
+    app.register_blueprint(search_api)
+    return api
+
+
+def _api() -> SearchApi:
+    return current_app.extensions['search_api']
+
+
+def request_tenant() -> str:
+    """Tenant the current request's upstream usage is accounted to"""
+    return tenant_id(request.headers.get('X-API-Key'), request.remote_addr)
+
+
+@search_api.route('/api/search/papers', methods=['GET'])
+def search_papers():
+    """Enhanced paper search endpoint"""
+    api = _api()
+    search_service = api.search_service
+    query = request.args.get('query')
+    limit = max(1, min(int(request.args.get('limit', 10)), 50))  # Between 1 and 50
+    fields = parse_fields(request.args.get('fields'))  # e.g. fields=title,year for lean list views
+    author = request.args.get('author', '').strip()
+    venue = request.args.get('venue', '').strip()
+
+    if not query or len(query.strip()) < 3:
+        return jsonify({
+            'success': False,
+            'error': 'Query must be at least 3 characters long',
+            'papers': []
+        }), 400
+
+    try:
+        api.cache_warmer.record(query.strip(), limit)
+        # Clients can mark their own traffic as background, e.g. for bulk exports
+        priority = BACKGROUND if request.headers.get('X-Priority') == BACKGROUND else INTERACTIVE
+        # Fresh cached results cost nothing and are served whatever the load
+        entry, _ = search_service.cache.lookup(query.strip(), limit)
+        if entry is None:
+            try:
+                with api.admission.admit(), api.cache_warmer.live_request(), \
+                        search_service.scheduler.tenant(request_tenant(), priority):
+                    entry = search_service.search_entry(query.strip(), limit)
+            except Overloaded as e:
+                entry = search_service.degraded_entry(query.strip(), limit)
+                if entry is None:
+                    logger.warning(f"Shed search for: {query.strip()} ({e.reason})")
+                    response = jsonify({
+                        'success': False,
+                        'error': 'Service overloaded, try again later',
+                        'papers': []
+                    })
+                    response.headers['Retry-After'] = str(e.retry_after)
+                    return response, 503
+                api.admission.record_degraded()
+        status = 200 if entry.data['success'] else 500
+        if entry.data['success'] and entry.data['papers']:
+            search_service.suggest_index.add_query(' '.join(query.split()))
+        if author or venue:
+            papers = search_service.names.filter(entry.data['papers'], author, venue)
+            entry = CacheEntry(dict(entry.data, papers=papers, count=len(papers)),
+                               entry.limit, entry.timestamp, entry.max_age)
+        return json_response(entry.projected(fields), request.headers, status)
+
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'papers': []
+        }), 500
+
+
+@search_api.route('/api/suggest', methods=['GET'])
+def suggest():
+    """Typeahead suggestions for a partial query, answered from memory without upstream calls"""
+    started = time.perf_counter()
+    prefix = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 8)), MAX_SUGGESTIONS))
+    except ValueError:
+        limit = 8
+
+    response = jsonify({
+        'success': True,
+        'query': prefix,
+        'suggestions': _api().search_service.suggest_index.suggest(prefix, limit),
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+    # Keystrokes repeat prefixes, a short client cache saves round trips without going stale
+    response.headers['Cache-Control'] = 'public, max-age=30'
+    return response
+
+
+@search_api.route('/api/search/jobs', methods=['POST'])
+def submit_search_job():
+    """Queue a search job and return its id right away"""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    queries = body.get('queries') or ([body['query']] if body.get('query') else [])
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({'success': False, 'error': 'queries must be a list of strings'}), 400
+    queries = [query.strip() for query in queries]
+    try:
+        limit = max(1, min(int(body.get('limit', 10)), MAX_JOB_LIMIT))  # Between 1 and MAX_JOB_LIMIT
+    except (TypeError, ValueError):
+        limit = 10
+
+    if not queries or any(len(query) < 3 for query in queries):
+        return jsonify({
+            'success': False,
+            'error': 'Provide a query or a list of queries of at least 3 characters each'
+        }), 400
+    if len(queries) > MAX_JOB_QUERIES:
+        return jsonify({
+            'success': False,
+            'error': f'A job can run at most {MAX_JOB_QUERIES} queries'
+        }), 400
+
+    try:
+        job_id = _api().job_queue.submit('search', {'queries': queries, 'limit': limit, 'tenant': request_tenant()})
+    except QueueFull as e:
+        logger.warning(f"Rejected search job: {e}")
+        response = jsonify({'success': False, 'error': 'Too many queued jobs, try again later'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    status_url = url_for('.get_search_job', job_id=job_id)
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': status_url,
+        'events_url': url_for('.stream_search_job', job_id=job_id)
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+@search_api.route('/api/search/jobs/<job_id>', methods=['GET'])
+def get_search_job(job_id):
+    """Status and progress of a search job, with its results once it has finished"""
+    job = _api().job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    return jsonify(dict(job, success=job['status'] != FAILED))
+
+
+@search_api.route('/api/search/jobs/<job_id>/events', methods=['GET'])
+def stream_search_job(job_id):
+    """Server-sent progress events of a search job; clients reconnect after JOB_STREAM_SECONDS"""
+    job_queue = _api().job_queue
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+
+    def events():
+        last_state = None
+        deadline = time.time() + JOB_STREAM_SECONDS
+        while time.time() < deadline:
+            job = job_queue.get(job_id)
+            if job is None:
+                return
+            state = (job['status'], job['progress']['done'])
+            if state != last_state:
+                last_state = state
+                # Results are left to the status URL, events only carry progress
+                job.pop('result', None)
+                yield f"event: {job['status']}\ndata: {dumps(job)}\n\n"
+            if job['status'] in (DONE, FAILED):
+                return
+            time.sleep(0.5)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-store'})
+
+
+@search_api.route('/api/papers/graph', methods=['GET'])
+def expand_citation_graph():
+    """Stream the citation graph around papers as NDJSON node and edge events"""
+    seeds = [seed.strip() for seed in request.args.getlist('id') if seed.strip()]
+    direction = request.args.get('direction', 'references')
+    try:
+        depth = max(1, min(int(request.args.get('depth', 1)), MAX_GRAPH_DEPTH))
+        max_nodes = max(1, min(int(request.args.get('max_nodes', 500)), MAX_GRAPH_NODES))
+    except ValueError:
+        seeds = []
+
+    if not seeds or direction not in DIRECTIONS:
+        return jsonify({
+            'success': False,
+            'error': f"Provide paper ids (OpenAlex ids or DOIs), a numeric depth and a direction of {', '.join(DIRECTIONS)}"
+        }), 400
+
+    api = _api()
+    tenant = request_tenant()
+
+    def events():
+        with api.search_service.scheduler.tenant(tenant):
+            for event in api.citation_graph.expand(seeds, direction, depth, max_nodes=max_nodes):
+                yield encode_json(event) + b'\n'
+
+    return Response(events(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-store'})
+
+
+@search_api.route('/metrics', methods=['GET'])
+def metrics():
+    """Upstream usage per source and tenant, cache, suggest index and name registry sizes, and admission control"""
+    api = _api()
+    search_service = api.search_service
+    return jsonify({
+        'scheduler': search_service.scheduler.metrics(),
+        'source_cache': search_service.source_cache.stats(),
+        'suggest_index': search_service.suggest_index.stats(),
+        'admission': api.admission.metrics(),
+        'names': search_service.names.stats()
+    })
+
+
+@search_api.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint, 503 until startup warmup has finished"""
+    prewarmer = _api().prewarmer
+    return jsonify(prewarmer.status()), 200 if prewarmer.ready else 503
@@ -0,0 +1,262 @@
+import gzip
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from flask import Response
+
+from json_codec import encode_json
+from source_cache import canonicalize_query
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses fall back to gzip
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed, gzip overhead outweighs the savings
+MIN_COMPRESS_SIZE = 1024
+
+# Preferred order when the client accepts several encodings
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Projections kept per entry; rarer field combinations are rebuilt per request
+MAX_PROJECTIONS = 8
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a comma-separated fields parameter into a projection key, None meaning all fields
+
+    The paper id is always included so clients can still tell papers apart.
+    """
+    if not value:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    if not fields:
+        return None
+    return tuple(sorted(fields | {'id'}))
+
+
+class CacheEntry:
+    """Search result cached together with its serialized response bytes"""
+
+    __slots__ = ('data', 'body', 'etag', 'limit', 'timestamp', 'max_age', '_variants', '_slices', '_projections')
+
+    def __init__(self, data: Dict[str, Any], limit: Optional[int] = None,
+                 timestamp: Optional[float] = None, max_age: float = 0):
+        self.data = data
+        self.body = encode_json(data)
+        self.etag = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.limit = limit if limit is not None else len(data.get('papers', []))
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.max_age = max_age
+        self._variants: Dict[str, bytes] = {}
+        self._slices: Dict[int, 'CacheEntry'] = {}
+        self._projections: Dict[Tuple[str, ...], 'CacheEntry'] = {}
+
+    def is_fresh(self) -> bool:
+        """Check whether the entry is younger than its max age"""
+        return time.time() - self.timestamp < self.max_age
+
+    def remaining(self) -> int:
+        """Seconds left before the entry expires"""
+        return max(0, int(self.max_age - (time.time() - self.timestamp)))
+
+    def compressed(self, encoding: str) -> bytes:
+        """Body compressed with the given encoding, compressed on first use and kept with the entry"""
+        variant = self._variants.get(encoding)
+        if variant is None:
+            if encoding == 'br':
+                variant = brotli.compress(self.body, quality=5)
+            else:
+                variant = gzip.compress(self.body, compresslevel=6)
+            self._variants[encoding] = variant
+        return variant
+
+    def covers(self, limit: int) -> bool:
+        """Check whether the entry holds every paper a request for limit results needs"""
+        # A source that returned fewer papers than were asked for has nothing more to give
+        papers = self.data.get('papers', [])
+        return limit <= self.limit or len(papers) < self.limit
+
+    def sliced(self, limit: int) -> 'CacheEntry':
+        """Entry holding only the first limit papers, encoded once per limit"""
+        papers = self.data.get('papers', [])
+        if limit >= len(papers):
+            return self
+
+        entry = self._slices.get(limit)
+        if entry is None:
+            data = dict(self.data, papers=papers[:limit], count=limit)
+            entry = CacheEntry(data, limit, self.timestamp, self.max_age)
+            self._slices[limit] = entry
+        return entry
+
+    def projected(self, fields: Optional[Tuple[str, ...]]) -> 'CacheEntry':
+        """Entry whose papers keep only the given fields, encoded once per projection"""
+        if fields is None:
+            return self
+
+        entry = self._projections.get(fields)
+        if entry is None:
+            papers = [{name: paper[name] for name in fields if name in paper}
+                      for paper in self.data.get('papers', [])]
+            entry = CacheEntry(dict(self.data, papers=papers), self.limit, self.timestamp, self.max_age)
+            if len(self._projections) < MAX_PROJECTIONS:
+                self._projections[fields] = entry
+        return entry
+
+
+class SearchCache:
+    """Search result cache keyed by canonical query
+
+    One entry is kept per canonical query. Requests for fewer results are
+    answered by slicing a larger entry, and requests for more results get
+    back the smaller entry so the caller can fetch only the missing tail.
+    Each entry's lifetime is shortened by a random fraction of up to
+    jitter so entries cached together do not all expire together.
+
+    Expired entries stay available to peek (for answers under load) for
+    max_stale seconds and are then dropped; beyond max_entries queries the
+    least recently used entries go first, with all their slices and
+    encoded variants.
+    """
+
+    def __init__(self, max_age: float, jitter: float = 0.0, max_entries: int = 5000,
+                 max_stale: Optional[float] = None):
+        self.max_age = max_age
+        self.jitter = jitter
+        self.max_entries = max_entries
+        self.max_stale = max_age if max_stale is None else max_stale
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, query: str) -> Optional[CacheEntry]:
+        """Return the entry for a query even if it has expired, unless it is past max_stale"""
+        with self._lock:
+            return self._get(canonicalize_query(query))
+
+    def lookup(self, query: str, limit: int) -> Tuple[Optional[CacheEntry], Optional[CacheEntry]]:
+        """Return (hit, partial) for a request
+
+        hit answers the request directly; partial is a fresh entry with
+        fewer results than requested that can be topped up.
+        """
+        with self._lock:
+            entry = self._get(canonicalize_query(query))
+        if entry is None or not entry.is_fresh():
+            return None, None
+        if entry.covers(limit):
+            return entry.sliced(limit), None
+        return None, entry
+
+    def store(self, query: str, limit: int, result: Dict[str, Any],
+              timestamp: Optional[float] = None) -> CacheEntry:
+        """Cache a result fetched for limit papers and return its entry"""
+        key = canonicalize_query(query)
+        max_age = self.max_age * (1 - self.jitter * random.random())
+        entry = CacheEntry(result, limit, timestamp, max_age)
+
+        with self._lock:
+            # Never replace a fresh entry that already holds more results
+            current = self._get(key)
+            if current is not None and current.is_fresh() and current.limit > limit:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # Least recently used entries come first; drop those long expired
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if not self._is_dead(oldest):
+                    break
+                self._entries.popitem(last=False)
+        return entry
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_dead(entry):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _is_dead(self, entry: CacheEntry) -> bool:
+        """Check whether an entry is past its max age plus max_stale"""
+        return time.time() - entry.timestamp >= entry.max_age + self.max_stale
+
+
+def _pick_encoding(accept_encoding: str) -> Optional[str]:
+    """Choose the best supported content encoding from an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against the entry's base ETag"""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        # Compressed variants carry an encoding suffix but share the base hash
+        if tag.strip('"').split('-', 1)[0] == etag:
+            return True
+    return False
+
+
+def json_response(entry: CacheEntry, request_headers: Mapping[str, str], status: int = 200) -> Response:
+    """Build a response that writes the entry's pre-serialized bytes as-is
+
+    Successful responses carry an ETag, answer matching If-None-Match
+    requests with 304 and advertise the time left in the cache via
+    Cache-Control.
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    body = entry.body
+    etag = entry.etag
+
+    encoding = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = _pick_encoding(request_headers.get('Accept-Encoding', ''))
+    if encoding is not None:
+        body = entry.compressed(encoding)
+        etag = f"{etag}-{encoding}"
+        headers['Content-Encoding'] = encoding
+
+    if status != 200:
+        headers['Cache-Control'] = 'no-store'
+        return Response(body, status=status, mimetype='application/json', headers=headers)
+
+    headers['ETag'] = f'"{etag}"'
+    headers['Cache-Control'] = f"public, max-age={entry.remaining()}"
+
+    if _etag_matches(request_headers.get('If-None-Match', ''), entry.etag):
+        headers.pop('Content-Encoding', None)
+        return Response(status=304, headers=headers)
+
+    # Passing the bytes object straight through avoids another copy in Werkzeug
+    return Response(body, status=status, mimetype='application/json', headers=headers)
@@ -1,72 +1,126 @@
 import sys
+import re
 import json
+import argparse
+import functools
+import threading
 import requests
 import traceback
 import time
 import socket
-from datetime import datetime
+from datetime import datetime, timedelta
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import concurrent.futures
 from collections import OrderedDict
 
+from json_codec import dumps, encode_json, iter_response_items
+from enrichment import PaperEnricher
+from arxiv_mirror import get_mirror, mirror_lag
+from reranker import PaperReranker
+from source_cache import SourceCache
+
 class TimeoutError(Exception):
     pass
 
-def search_papers(query, max_results=10):
+# Shared so their per-DOI and per-paper caches survive across searches in the same process
+enricher = PaperEnricher()
+reranker = PaperReranker()
+# Per-source results; a source that came back empty is not asked again for a while, e.g. across a batch
+source_cache = SourceCache(max_age=3600)
+
+def search_papers(query, max_results=10, enrich=True, rerank=False):
     """Search for academic papers using multiple APIs in parallel.
     
     Args:
         query (str): Search query string
         max_results (int): Maximum number of results to return
+        enrich (bool): Fill citations, venues and PDF links from OpenAlex in batched lookups
+        rerank (bool): Order by relevance to the query instead of by date (needs numpy)
         
     Returns:
         str: JSON string containing papers or error message
     """
     try:
-        # Define search functions to run in parallel
-        search_functions = [
-            (search_arxiv, query, max_results),
-            (search_crossref, query, max_results)
-        ]
-        
-        papers = []
-        
-        # Use ThreadPoolExecutor to run searches in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(search_functions)) as executor:
-            # Start the search operations and mark each future with its search function
-            future_to_search = {
-                executor.submit(func, query, max_results): func.__name__ 
-                for func, query, max_results in search_functions
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_search):
-                search_name = future_to_search[future]
-                try:
-                    result = future.result()
-                    if result:
-                        papers.extend(result)
-                        print(f"Successfully retrieved {len(result)} papers from {search_name}", file=sys.stderr)
-                except Exception as e:
-                    print(f"Error in {search_name}: {str(e)}", file=sys.stderr)
-        
-        # Deduplicate papers based on title and first author
-        unique_papers = OrderedDict()
-        for paper in papers:
-            # Create a unique key using title and first author (if available)
-            title = paper.get('title', '').lower().strip()
-            first_author = paper.get('authors', [''])[0].lower() if paper.get('authors') else ''
-            key = f"{title}:{first_author}"
-            
-            # Only keep the first occurrence of each paper
-            if key not in unique_papers:
-                unique_papers[key] = paper
+        return dumps(find_papers(query, max_results, enrich, rerank))
+
+    except Exception as e:
+        # Catch any unexpected errors
+        error_msg = f"ERROR in search_papers: {str(e)}"
+        print(error_msg, file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return dumps({"error": error_msg})
+
+def find_papers(query, max_results=10, enrich=True, rerank=False):
+    """Search for academic papers using multiple APIs in parallel.
+    
+    Same as search_papers, but returns the papers as a list and lets
+    errors propagate. Raises when no source could be searched, so an
+    outage is not mistaken for a query without results.
+    
+    Returns:
+        list: List of paper dictionaries
+    """
+    # Define search functions to run in parallel
+    search_functions = [
+        ('arxiv', search_arxiv),
+        ('crossref', search_crossref)
+    ]
+    
+    papers = []
+    errors = []
+    
+    # Use ThreadPoolExecutor to run searches in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(search_functions)) as executor:
+        # Start the search operations and mark each future with its search function;
+        # sources with a cached response for this query and page are not asked again
+        future_to_search = {
+            executor.submit(source_cache.fetch, source, query, (0, max_results),
+                            functools.partial(func, query, max_results)): func.__name__
+            for source, func in search_functions
+        }
         
-        # Convert back to list and limit to max_results
-        unique_papers_list = list(unique_papers.values())[:max_results]
+        for future in concurrent.futures.as_completed(future_to_search):
+            search_name = future_to_search[future]
+            try:
+                result, _ = future.result()
+                if result:
+                    papers.extend(result)
+                    print(f"Successfully retrieved {len(result)} papers from {search_name}", file=sys.stderr)
+            except Exception as e:
+                errors.append(f"{search_name}: {str(e)}")
+                print(f"Error in {search_name}: {str(e)}", file=sys.stderr)
+    
+    if len(errors) == len(search_functions):
+        raise Exception(f"All sources failed ({'; '.join(errors)})")
+    
+    # Deduplicate papers based on title and first author
+    unique_papers = OrderedDict()
+    for paper in papers:
+        # Create a unique key using title and first author (if available)
+        title = paper.get('title', '').lower().strip()
+        first_author = paper.get('authors', [''])[0].lower() if paper.get('authors') else ''
+        key = f"{title}:{first_author}"
         
-        # Sort by date (newest first)
-        # For papers without a date, put them at the end
+        # Only keep the first occurrence of each paper
+        if key not in unique_papers:
+            unique_papers[key] = paper
+    
+    # Convert back to list and limit to max_results
+    unique_papers_list = list(unique_papers.values())
+    rerank = rerank and reranker.available
+    if rerank:
+        # Rank the whole merged candidate set so the best papers survive the cut
+        unique_papers_list = reranker.rerank(query, unique_papers_list)
+    unique_papers_list = unique_papers_list[:max_results]
+    
+    # arXiv has no citation counts and Crossref no open-access data, look them up in bulk
+    if enrich:
+        enricher.enrich(unique_papers_list)
+    
+    # Sort by date (newest first)
+    # For papers without a date, put them at the end
+    if not rerank:
         unique_papers_list.sort(
             key=lambda x: (
                 x.get('published_date', '') or x.get('year', ''),  # Try to use published_date first, then fall back to year
@@ -74,19 +128,35 @@ def search_papers(query, max_results=10):
             ),
             reverse=True
         )
-        
-        # Ensure we don't exceed max_results after sorting
-        unique_papers_list = unique_papers_list[:max_results]
-        
-        print(f"Total unique papers found: {len(unique_papers_list)}", file=sys.stderr)
-        return json.dumps(unique_papers_list)
+    
+    # Ensure we don't exceed max_results after sorting
+    unique_papers_list = unique_papers_list[:max_results]
+    
+    print(f"Total unique papers found: {len(unique_papers_list)}", file=sys.stderr)
+    return unique_papers_list
 
-    except Exception as e:
-        # Catch any unexpected errors
-        error_msg = f"ERROR in search_papers: {str(e)}"
-        print(error_msg, file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        return json.dumps({"error": error_msg})
+class RateLimiter:
+    """Spaces out requests so a source sees at most `rate` requests per second across threads."""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the next request slot is due."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# Per-source request rates shared by every thread in the process (arXiv asks for one request per 3 seconds)
+RATE_LIMITS = {
+    'arxiv': RateLimiter(1 / 3),
+    'crossref': RateLimiter(10)
+}
 
 def create_http_session(retries=3, backoff_factor=0.3):
     """Create a requests session with retry logic."""
@@ -95,13 +165,19 @@ def create_http_session(retries=3, backoff_factor=0.3):
         total=retries,
         backoff_factor=backoff_factor,
         status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
+        allowed_methods=["GET"],
+        # Hand back the last response once retries run out, its status and Retry-After tell
+        # a throttled source from a failing one
+        raise_on_status=False
     )
     adapter = HTTPAdapter(max_retries=retry)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
 
+# Top-level Crossref fields the results are built from, the only ones requested and parsed
+CROSSREF_FIELDS = ('DOI', 'title', 'author', 'abstract', 'published-print', 'is-referenced-by-count', 'container-title')
+
 def search_crossref(query, max_results=10, timeout_seconds=15):
     """Search academic papers using Crossref API with a timeout and retries."""
     try:
@@ -112,7 +188,8 @@ def search_crossref(query, max_results=10, timeout_seconds=15):
             'query': query,
             'rows': max_results,
             'sort': 'relevance',
-            'order': 'desc'
+            'order': 'desc',
+            'select': ','.join(CROSSREF_FIELDS)
         }
         
         print(f"Sending request to Crossref API with timeout={timeout_seconds}s...", file=sys.stderr)
@@ -121,31 +198,32 @@ def search_crossref(query, max_results=10, timeout_seconds=15):
         session = create_http_session()
         
         # Make the request with a timeout (both connect and read timeouts)
-        response = session.get(
+        RATE_LIMITS['crossref'].wait()
+        # The body is streamed and decoded item by item, large pages are never held in memory whole
+        with session.get(
             'https://api.crossref.org/works',
             params=params,
             headers={
                 'User-Agent': 'ResearchAssistant/1.0 (mailto:research@example.com)',
                 'Accept': 'application/json'
             },
-            timeout=(5, timeout_seconds)  # 5s connect timeout, timeout_seconds read timeout
-        )
-        
-        print(f"Received response with status code: {response.status_code}", file=sys.stderr)
-        
-        # Check if request was successful
-        if response.status_code == 200:
+            timeout=(5, timeout_seconds),  # 5s connect timeout, timeout_seconds read timeout
+            stream=True
+        ) as response:
+            
+            print(f"Received response with status code: {response.status_code}", file=sys.stderr)
+            
+            # Check if request was successful
+            if response.status_code != 200:
+                print(f"Crossref API returned status code {response.status_code}", file=sys.stderr)
+                print(f"Response content: {response.text}", file=sys.stderr)
+                response.raise_for_status()
+                raise Exception(f"Crossref API returned status code {response.status_code}")
+            
             try:
-                data = response.json()
-                items = data.get('message', {}).get('items', [])
-                
-                if not items:
-                    print("No results found in Crossref", file=sys.stderr)
-                    return []
-                    
                 # Process results
                 papers = []
-                for item in items:
+                for item in iter_response_items(response, 'message.items', CROSSREF_FIELDS):
                     try:
                         # Extract authors
                         authors = []
@@ -182,42 +260,84 @@ def search_crossref(query, max_results=10, timeout_seconds=15):
                         print(f"Error processing paper: {str(e)}", file=sys.stderr)
                         continue
                 
+                if not papers:
+                    print("No results found in Crossref", file=sys.stderr)
+                    return []
+                
                 print(f"Successfully processed {len(papers)} papers from Crossref", file=sys.stderr)
                 return papers
                 
             except Exception as e:
+                # The body has been consumed by the parser, so there is no content left to print
                 print(f"Error parsing Crossref response: {str(e)}", file=sys.stderr)
-                print(f"Response content: {response.text[:500]}...", file=sys.stderr)  # Print first 500 chars of response
-                return []
-        else:
-            print(f"Crossref API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response content: {response.text}", file=sys.stderr)
-            return []
-            
+                raise Exception(f"Error parsing Crossref response: {str(e)}")
+    
+    # Failures are raised, not turned into an empty result, so callers and the source cache can tell them apart
     except (requests.exceptions.Timeout, socket.timeout) as e:
         error_msg = f"Crossref search timed out after {timeout_seconds}s: {str(e)}"
         print(error_msg, file=sys.stderr)
-        return []
+        raise Exception(error_msg) from e
     except (requests.exceptions.RequestException, socket.gaierror) as e:
         error_msg = f"Network error searching Crossref: {str(e)}"
         print(error_msg, file=sys.stderr)
-        return []
-    except Exception as e:
-        error_msg = f"Unexpected error in Crossref search: {str(e)}"
-        print(error_msg, file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        return []
+        raise Exception(error_msg) from e
+
+# A mirror trailing by more than this also asks the live API for the records it is missing
+MIRROR_MAX_LAG = timedelta(hours=36)
 
 def search_arxiv(query, max_results=10, timeout_seconds=15):
+    """Search arXiv, serving from the local metadata mirror when one has been harvested.
+    
+    The mirror (see arxiv_mirror.py) answers queries locally. The live API is
+    only used when there is no mirror, or for records updated since the
+    mirror's last sync when that is more than MIRROR_MAX_LAG ago.
+    
+    Args:
+        query (str): Search query string
+        max_results (int): Maximum number of results to return
+        timeout_seconds (int): Request timeout in seconds
+        
+    Returns:
+        list: List of paper dictionaries, empty if nothing matched
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        return search_arxiv_live(query, max_results, timeout_seconds)
+    
+    try:
+        papers = mirror.search(query, max_results)
+        print(f"Found {len(papers)} papers in the local arXiv mirror", file=sys.stderr)
+    except Exception as e:
+        print(f"arXiv mirror search failed, using the live API: {str(e)}", file=sys.stderr)
+        return search_arxiv_live(query, max_results, timeout_seconds)
+    
+    if mirror_lag(mirror) <= MIRROR_MAX_LAG:
+        return papers
+    
+    # Recent records come first in arXiv's date ordering, so put them ahead of the mirror's
+    try:
+        recent = search_arxiv_live(query, max_results, timeout_seconds, updated_since=mirror.synced_through())
+    except Exception as e:
+        print(f"arXiv live search for recent records failed, using the mirror only: {str(e)}", file=sys.stderr)
+        return papers
+    recent_ids = {re.sub(r'v\d+$', '', paper['id']) for paper in recent}
+    papers = recent + [paper for paper in papers if paper['id'].split('/')[-1] not in recent_ids]
+    return papers[:max_results]
+
+def search_arxiv_live(query, max_results=10, timeout_seconds=15, updated_since=None):
     """Search academic papers using arXiv API with improved query handling and error recovery.
     
     Args:
         query (str): Search query string
         max_results (int): Maximum number of results to return
         timeout_seconds (int): Request timeout in seconds
+        updated_since (datetime): Only return records updated after this time
         
     Returns:
-        list: List of paper dictionaries or empty list on error
+        list: List of paper dictionaries, empty if nothing matched
+        
+    Raises:
+        Exception: When arXiv could not be searched
     """
     try:
         print(f"Searching arXiv for '{query}'...", file=sys.stderr)
@@ -241,6 +361,9 @@ def search_arxiv(query, max_results=10, timeout_seconds=15):
             try:
                 # Construct the API URL with the current domain and better query handling
                 query_terms = [f"all:{term}" for term in query.split() if term.strip() and term != 'sort:date']
+                if updated_since is not None:
+                    now = datetime.utcnow()
+                    query_terms.append(f"lastUpdatedDate:[{updated_since:%Y%m%d%H%M}+TO+{now:%Y%m%d%H%M}]")
                 search_query = '+AND+'.join(query_terms)
                 
                 # Always sort by last updated date in descending order
@@ -259,6 +382,7 @@ def search_arxiv(query, max_results=10, timeout_seconds=15):
                 
                 # Make the request with timeout
                 print("Sending request to arXiv API...", file=sys.stderr)
+                RATE_LIMITS['arxiv'].wait()
                 response = session.get(
                     url,
                     headers={'User-Agent': 'ResearchAssistant/1.0 (mailto:research@example.com)'},
@@ -269,7 +393,9 @@ def search_arxiv(query, max_results=10, timeout_seconds=15):
                 # If we got a successful response, break out of the retry loop
                 if response.status_code == 200:
                     break
-                    
+                last_error = requests.exceptions.HTTPError(
+                    f"arXiv API returned status code {response.status_code}", response=response)
+                
             except (requests.exceptions.RequestException, socket.gaierror) as e:
                 last_error = e
                 print(f"Error with {domain}: {str(e)}", file=sys.stderr)
@@ -281,10 +407,6 @@ def search_arxiv(query, max_results=10, timeout_seconds=15):
             else:
                 raise Exception("All arXiv API endpoints failed")
         
-        if response.status_code != 200:
-            print(f"arXiv API returned status code {response.status_code}", file=sys.stderr)
-            return []
-            
         # arXiv returns XML, but we can extract what we need using string operations to avoid XML parsing issues
         content = response.text
         print(f"Received content length: {len(content)} characters", file=sys.stderr)
@@ -356,16 +478,11 @@ def search_arxiv(query, max_results=10, timeout_seconds=15):
     except (requests.exceptions.Timeout, socket.timeout) as e:
         error_msg = f"arXiv search timed out after {timeout_seconds}s: {str(e)}"
         print(error_msg, file=sys.stderr)
-        return []
+        raise Exception(error_msg) from e
     except (requests.exceptions.RequestException, socket.gaierror) as e:
         error_msg = f"Network error searching arXiv: {str(e)}"
         print(error_msg, file=sys.stderr)
-        return []
-    except Exception as e:
-        error_msg = f"Unexpected error in arXiv search: {str(e)}"
-        print(error_msg, file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        return []
+        raise Exception(error_msg) from e
 
 def extract_between_tags(text, start_tag, end_tag):
     """Extract content between XML tags."""
@@ -376,41 +493,132 @@ def extract_between_tags(text, start_tag, end_tag):
     except (ValueError, IndexError):
         return ""
 
+def load_checkpoint(path):
+    """Return the set of queries a previous batch run already completed."""
+    done = set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    done.add(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return done
+
+def run_batch(queries, output, checkpoint_path=None, workers=4, max_results=10,
+              per_paper=False, enrich=True, rerank=False):
+    """Run many queries concurrently and stream the results as NDJSON.
+    
+    Args:
+        queries (list): Query strings, duplicates are searched once
+        output: Binary file object the NDJSON lines are written to
+        checkpoint_path (str): File listing completed queries; they are skipped on the next run
+        workers (int): Number of queries searched at the same time
+        max_results (int): Maximum number of results per query
+        per_paper (bool): Write one line per paper instead of one line per query
+        enrich (bool): Enrich results with OpenAlex data
+        rerank (bool): Order results by relevance
+        
+    Returns:
+        tuple: (number of queries completed, number of queries that failed)
+    """
+    done = load_checkpoint(checkpoint_path) if checkpoint_path else set()
+    pending = [query for query in dict.fromkeys(queries) if query not in done]
+    print(f"{len(pending)} queries to run, {len(done)} already done", file=sys.stderr)
+    
+    def run_one(query):
+        try:
+            return query, find_papers(query, max_results, enrich, rerank), None
+        except Exception as e:
+            return query, None, str(e)
+    
+    completed = failed = 0
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+    try:
+        # Per-source rate limits are enforced inside the search functions, shared by all workers
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_one, query) for query in pending]
+            for future in concurrent.futures.as_completed(futures):
+                query, papers, error = future.result()
+                if error is not None:
+                    records = [{"query": query, "error": error}]
+                    failed += 1
+                elif per_paper:
+                    records = [dict(paper, query=query) for paper in papers]
+                else:
+                    records = [{"query": query, "count": len(papers), "papers": papers}]
+                
+                output.write(b"".join(encode_json(record) + b"\n" for record in records))
+                output.flush()
+                
+                # Failed queries stay out of the checkpoint so a rerun retries them
+                if checkpoint is not None and error is None:
+                    checkpoint.write(dumps(query) + "\n")
+                    checkpoint.flush()
+                completed += 1
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    return completed, failed
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Search academic papers on arXiv and Crossref")
+    parser.add_argument('query', nargs='*', help="Query to search for")
+    parser.add_argument('--batch', help="File with one query per line ('-' for stdin), results are written as NDJSON")
+    parser.add_argument('--output', help="NDJSON output file for batch mode (default: stdout)")
+    parser.add_argument('--checkpoint', help="Checkpoint file for batch mode (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=4, help="Queries searched concurrently in batch mode")
+    parser.add_argument('--max-results', type=int, default=10, help="Maximum number of results per query")
+    parser.add_argument('--per-paper', action='store_true', help="Write one NDJSON line per paper")
+    parser.add_argument('--rerank', action='store_true', help="Order results by relevance to the query")
+    parser.add_argument('--no-enrich', action='store_true', help="Skip OpenAlex enrichment")
+    args = parser.parse_args()
+    
+    if not args.batch and not args.query:
         print("Usage: python search_papers.py <query>")
+        print("       python search_papers.py --batch queries.txt --output results.ndjson")
         sys.exit(1)
-        
-    query = ' '.join(sys.argv[1:])
-    print(f"Running search for '{query}'...", file=sys.stderr)
     
     start_time = time.time()
     
-    try:
-        # First try Crossref with a timeout
-        print("\n=== TRYING CROSSREF ===", file=sys.stderr)
-        crossref_start = time.time()
-        papers = search_crossref(query)
-        crossref_time = time.time() - crossref_start
-        print(f"Crossref search completed in {crossref_time:.2f} seconds", file=sys.stderr)
-        
-        # If no results from Crossref, try arXiv
-        if not papers:
-            print("\nNo results from Crossref, trying arXiv...", file=sys.stderr)
-            arxiv_start = time.time()
-            papers = search_arxiv(query)
-            arxiv_time = time.time() - arxiv_start
-            print(f"ArXiv search completed in {arxiv_time:.2f} seconds", file=sys.stderr)
+    if args.batch:
+        if args.batch == '-':
+            queries = [line.strip() for line in sys.stdin if line.strip()]
+        else:
+            with open(args.batch, 'r', encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
         
-        # Print results as JSON to stdout
-        print("\n=== SEARCH RESULTS ===", file=sys.stderr)
-        print(json.dumps(papers, indent=2))
+        checkpoint_path = args.checkpoint or (f"{args.output}.checkpoint" if args.output else None)
+        # Appending keeps the results of earlier, interrupted runs
+        output = open(args.output, 'ab') if args.output else sys.stdout.buffer
+        try:
+            completed, failed = run_batch(
+                queries, output, checkpoint_path, args.workers, args.max_results,
+                args.per_paper, not args.no_enrich, args.rerank
+            )
+        finally:
+            if args.output:
+                output.close()
+        print(f"Completed {completed} queries ({failed} failed)", file=sys.stderr)
+    else:
+        query = ' '.join(args.query)
+        print(f"Running search for '{query}'...", file=sys.stderr)
         
-    except Exception as e:
-        error_msg = f"Error in main search: {str(e)}"
-        print(error_msg, file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        print(json.dumps({"error": error_msg}))
+        try:
+            papers = find_papers(query, args.max_results, not args.no_enrich, args.rerank)
+            
+            # Print results as JSON to stdout
+            print("\n=== SEARCH RESULTS ===", file=sys.stderr)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(encode_json(papers, indent=True) + b"\n")
+            sys.stdout.flush()
+            
+        except Exception as e:
+            error_msg = f"Error in main search: {str(e)}"
+            print(error_msg, file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            print(dumps({"error": error_msg}))
     
     end_time = time.time()
     print(f"\nTotal execution time: {end_time - start_time:.2f} seconds", file=sys.stderr)
@@ -0,0 +1,153 @@
+import copy
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+OK = 'ok'
+EMPTY = 'empty'
+ERROR = 'error'
+THROTTLED = 'throttled'
+
+# Only characters that separate terms are folded; symbols such as + and # change
+# what the upstreams match ("C++" is not "C"), so they stay part of their term
+_SEPARATORS = re.compile(r'[\s,;\-\u2010-\u2015]+')
+_BOOLEAN_OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+def canonicalize_query(query: str) -> str:
+    """Normalize a query into its cache key form
+
+    Unicode is NFKC-normalized and case-folded, separators (whitespace,
+    commas, semicolons and hyphens) are collapsed and terms are sorted. Term order is kept for
+    queries with quoted phrases or boolean operators, where it matters to
+    the upstream sources.
+    """
+    text = unicodedata.normalize('NFKC', query)
+    ordered = '"' in text or any(term in _BOOLEAN_OPERATORS for term in text.split())
+    terms = _SEPARATORS.sub(' ', text.casefold()).split()
+    if not ordered:
+        terms.sort()
+    return ' '.join(terms)
+
+
+class CachedFailure(Exception):
+    """Raised for a lookup answered by a cached upstream error or throttled response"""
+
+    def __init__(self, source: str, kind: str, message: str):
+        super().__init__(f"{source} {kind} (cached): {message}")
+        self.source = source
+        self.kind = kind
+
+
+def throttle_delay(error: BaseException) -> Optional[float]:
+    """Retry-After seconds (0 if not given) of a 429/503 response found in an exception chain"""
+    while error is not None:
+        response = getattr(error, 'response', None)
+        if response is not None and getattr(response, 'status_code', None) in (429, 503):
+            retry_after = response.headers.get('Retry-After', '')
+            return float(retry_after) if retry_after.isdigit() else 0.0
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def _in_chain(error: BaseException, types: Tuple[Type[BaseException], ...]) -> bool:
+    while error is not None:
+        if isinstance(error, types):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class SourceCache:
+    """Cache of single upstream responses keyed by (source, canonical query, page)
+
+    Sits below the merge of several sources so a merged result can be
+    rebuilt from the pieces that are still cached, fetching only the
+    missing ones. Besides results it remembers failures, each kind for its
+    own short time: empty results, errors and throttled responses (for
+    Retry-After when the upstream sent one), so a query a source cannot
+    answer is not sent to it again on every request. Exceptions of the
+    types in uncacheable (e.g. local timeouts) are never cached.
+    """
+
+    def __init__(self, max_age: float = 3600, empty_ttl: float = 300, error_ttl: float = 60,
+                 throttled_ttl: float = 120, max_entries: int = 10000,
+                 uncacheable: Tuple[Type[BaseException], ...] = ()):
+        self.max_age = max_age
+        self.ttls = {OK: max_age, EMPTY: empty_ttl, ERROR: error_ttl, THROTTLED: throttled_ttl}
+        self.max_entries = max_entries
+        self.uncacheable = uncacheable
+        self._entries: 'OrderedDict[Hashable, Tuple[float, float, str, Any, Optional[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {'miss': 0, OK: 0, EMPTY: 0, ERROR: 0, THROTTLED: 0}
+
+    def fetch(self, source: str, query: str, page: Hashable, fetch: Callable[[], Any],
+              refresh: bool = False) -> Tuple[Any, float]:
+        """Return (value, fetched_at) for a page of a source, calling fetch on a miss
+
+        Cached failures are raised again as CachedFailure. With refresh=True
+        the cached piece is ignored and replaced.
+        """
+        key = (source, canonicalize_query(query), page)
+        cached = None if refresh else self._get(key)
+        if cached is not None:
+            fetched_at, kind, value, error = cached
+            self._count(kind)
+            if error is not None:
+                raise CachedFailure(source, kind, error)
+            return copy.copy(value), fetched_at
+
+        self._count('miss')
+        fetched_at = time.time()
+        try:
+            value = fetch()
+        except Exception as e:
+            if not _in_chain(e, self.uncacheable):
+                delay = throttle_delay(e)
+                # Only the message is kept, the exception would hold on to its traceback's frames
+                if delay is not None:
+                    self._put(key, fetched_at, THROTTLED, None, delay or self.ttls[THROTTLED], str(e))
+                else:
+                    self._put(key, fetched_at, ERROR, None, self.ttls[ERROR], str(e))
+            raise
+
+        # Results are dicts with a papers list (services) or plain paper lists (CLI)
+        if isinstance(value, dict) and not value.get('success', True):
+            kind = ERROR
+        else:
+            papers = value.get('papers') if isinstance(value, dict) else value
+            kind = OK if papers else EMPTY
+        self._put(key, fetched_at, kind, value, self.ttls[kind])
+        return copy.copy(value), fetched_at
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count plus misses and hits by kind of cached piece"""
+        with self._lock:
+            return {'entries': len(self._entries), 'lookups': dict(self.counts)}
+
+    def _get(self, key: Hashable) -> Optional[Tuple[float, str, Any, Optional[str]]]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            fetched_at, expires, kind, value, error = cached
+            if time.time() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return fetched_at, kind, value, error
+
+    def _put(self, key: Hashable, fetched_at: float, kind: str, value: Any, ttl: float,
+             error: Optional[str] = None):
+        with self._lock:
+            self._entries[key] = (fetched_at, fetched_at + ttl, kind, value, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.counts[kind] += 1
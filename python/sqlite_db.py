@@ -0,0 +1,28 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+def open_database(db_path: str, schema: str):
+    """Create the database directory and file in WAL mode and apply schema"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    with transaction(db_path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(schema)
+
+
+@contextmanager
+def transaction(db_path: str, row_factory: Optional[Callable] = None) -> Iterator[sqlite3.Connection]:
+    """Open a connection, commit on success and always close it
+
+    A connection per call keeps a database usable from worker threads.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
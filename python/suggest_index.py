@@ -0,0 +1,193 @@
+import bisect
+import heapq
+import logging
+import math
+import queue
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TITLE = 'title'
+AUTHOR = 'author'
+QUERY = 'query'
+
+# Shortest prefix answered, also the length of the prefixes keys are bucketed by
+MIN_PREFIX = 2
+
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Case-folded words of text separated by single spaces"""
+    return ' '.join(_NON_WORD.sub(' ', unicodedata.normalize('NFKC', text).casefold()).split())
+
+
+class SuggestIndex:
+    """In-memory prefix index for search box suggestions
+
+    Titles, author names and popular queries are indexed under every word
+    they contain (up to max_words), so "neur" suggests "Graph Neural
+    Networks". Keys live in sorted arrays, one per two-character prefix,
+    searched with bisect; a lookup scans at most max_scan keys of one array
+    and an update only re-sorts the small arrays it touches. When
+    max_suggestions is reached the lowest scored quarter is dropped.
+
+    Once started, updates are queued and applied by a background thread so
+    they never hold up the request that fed the index. Lookups take no
+    lock: arrays are replaced, never changed in place.
+    """
+
+    def __init__(self, max_suggestions: int = 200000, max_words: int = 8, max_scan: int = 500,
+                 max_queued: int = 1000):
+        self.max_suggestions = max_suggestions
+        self.max_words = max_words
+        self.max_scan = max_scan
+        # Suggestion id -> (kind, display text, paper id, year); scores change as popularity grows.
+        # Only strings and numbers, so the garbage collector stops tracking the index.
+        self._suggestions: List[Tuple[str, str, str, Any]] = []
+        self._scores: List[float] = []
+        self._ids: Dict[Tuple[str, str], int] = {}
+        # Two-character prefix -> sorted (key, suggestion id) array
+        self._buckets: Dict[str, List[Tuple[str, int]]] = {}
+        self._staged: List[Tuple[str, int]] = []
+        # What lookups read; replaced as a whole when the index is compacted
+        self._view = (self._buckets, self._suggestions, self._scores)
+        self._updates: 'queue.Queue[Tuple[Callable, Any]]' = queue.Queue(max_queued)
+        self._thread: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+
+    def start(self):
+        """Apply updates in a background thread from now on"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._apply_updates, name='suggest-index', daemon=True)
+            self._thread.start()
+
+    def add_papers(self, papers: Iterable[Dict[str, Any]]):
+        """Index the titles and authors of papers the service has returned"""
+        self._submit(self._index_papers, list(papers))
+
+    def add_query(self, query: str):
+        """Count a query that returned results"""
+        self._submit(self._index_query, query)
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Best scored suggestions with a word starting with prefix"""
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX:
+            return []
+        buckets, suggestions, scores = self._view
+
+        ids = set()
+        array = buckets.get(prefix[:MIN_PREFIX], [])
+        start = bisect.bisect_left(array, (prefix,))
+        for key, suggestion_id in array[start:start + self.max_scan]:
+            if not key.startswith(prefix):
+                break
+            ids.add(suggestion_id)
+
+        # A popular query is often also a title; show each text once
+        results = []
+        shown = set()
+        for suggestion_id in heapq.nsmallest(limit * 2, ids, key=lambda i: (-scores[i], len(suggestions[i][1]))):
+            kind, text, paper_id, year = suggestions[suggestion_id]
+            if text.casefold() not in shown:
+                shown.add(text.casefold())
+                suggestion = {'type': kind, 'text': text}
+                if kind == TITLE:
+                    suggestion.update(id=paper_id, year=year)
+                results.append(suggestion)
+        return results[:limit]
+
+    def stats(self) -> Dict[str, int]:
+        """Sizes of the index and its update queue"""
+        buckets, suggestions, _ = self._view
+        return {'suggestions': len(suggestions), 'keys': sum(map(len, list(buckets.values()))),
+                'queued': self._updates.qsize()}
+
+    def _submit(self, update: Callable, argument: Any):
+        if self._thread is None:
+            with self._write_lock:
+                update(argument)
+            return
+        try:
+            self._updates.put_nowait((update, argument))
+        except queue.Full:
+            # Suggestions are best effort, a burst of results may go unindexed
+            logger.debug("Suggest index update queue full, dropping update")
+
+    def _apply_updates(self):
+        while True:
+            update, argument = self._updates.get()
+            try:
+                with self._write_lock:
+                    update(argument)
+            except Exception as e:
+                logger.warning(f"Suggest index update failed: {e}")
+
+    def _index_papers(self, papers: List[Dict[str, Any]]):
+        for paper in papers:
+            title = paper.get('title') or ''
+            if not title or title == 'No title':
+                continue
+            score = 1 + math.log1p(float(paper.get('citations') or 0))
+            # Authors count once per paper, not once per time the paper is returned
+            if self._add(TITLE, title, score, str(paper.get('id') or ''), paper.get('year') or '', replace=True):
+                for author in paper.get('authors') or []:
+                    if isinstance(author, str) and author:
+                        self._add(AUTHOR, author, 1)
+        self._publish()
+
+    def _index_query(self, query: str):
+        self._add(QUERY, ' '.join(query.split()), 2)
+        self._publish()
+
+    def _add(self, kind: str, text: str, score: float, paper_id: str = '', year: Any = '',
+             replace: bool = False) -> bool:
+        """Add a suggestion or raise the score of a known one; True if it was new"""
+        normalized = normalize(text)
+        if len(normalized) < MIN_PREFIX:
+            return False
+        suggestion_id = self._ids.get((kind, normalized))
+        if suggestion_id is not None:
+            # Titles carry their latest citation count, authors and queries their popularity
+            self._scores[suggestion_id] = score if replace else self._scores[suggestion_id] + score
+            return False
+        if len(self._suggestions) >= self.max_suggestions:
+            self._compact()
+
+        suggestion_id = len(self._suggestions)
+        self._suggestions.append((kind, text, paper_id, year if isinstance(year, (int, str)) else ''))
+        self._scores.append(score)
+        self._ids[(kind, normalized)] = suggestion_id
+        words = normalized.split(' ')
+        self._staged.extend((' '.join(words[position:]), suggestion_id)
+                            for position in range(min(len(words), self.max_words)))
+        return True
+
+    def _publish(self):
+        """Make staged keys visible to lookups"""
+        added: Dict[str, List[Tuple[str, int]]] = {}
+        for entry in self._staged:
+            added.setdefault(entry[0][:MIN_PREFIX], []).append(entry)
+        self._staged = []
+        for bucket, entries in added.items():
+            self._buckets[bucket] = sorted(self._buckets.get(bucket, []) + entries)
+
+    def _compact(self):
+        """Drop the lowest scored quarter of the suggestions and renumber the rest"""
+        keep = sorted(heapq.nlargest(self.max_suggestions * 3 // 4, range(len(self._suggestions)),
+                                     key=self._scores.__getitem__))
+        renumber = {old: new for new, old in enumerate(keep)}
+        # Fresh lists, lookups running meanwhile keep using the old view
+        self._suggestions = [self._suggestions[old] for old in keep]
+        self._scores = [self._scores[old] for old in keep]
+        self._ids = {key: renumber[old] for key, old in self._ids.items() if old in renumber}
+        self._buckets = {
+            bucket: [(key, renumber[old]) for key, old in array if old in renumber]
+            for bucket, array in self._buckets.items()
+        }
+        self._staged = [(key, renumber[old]) for key, old in self._staged if old in renumber]
+        self._view = (self._buckets, self._suggestions, self._scores)
@@ -0,0 +1,61 @@
+import io
+import json
+import os
+import sys
+import tempfile
+
+import requests
+
+# The backend modules are imported flat, as the apps import each other
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing an app starts its job queue; keep the databases out of the tree, one per app
+_jobs_dir = tempfile.mkdtemp(prefix='search-tests-')
+os.environ.setdefault('SEARCH_JOBS_DB', os.path.join(_jobs_dir, 'jobs.db'))
+os.environ.setdefault('IMPROVED_SEARCH_JOBS_DB', os.path.join(_jobs_dir, 'improved_search_jobs.db'))
+
+
+class FakeResponse:
+    """requests response stand-in over a canned body: JSON data, or raw content"""
+
+    def __init__(self, data=None, status_code=200, headers=None, content=None):
+        if content is None:
+            content = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        # Streamed JSON is decoded from raw
+        self.raw = io.BytesIO(content)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class FakeSession:
+    """requests session stand-in answering each GET with respond(url, params, headers)
+
+    Requests are recorded as dicts of url, params and headers.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        request = {'url': url, 'params': params or {}, 'headers': headers or {}}
+        self.requests.append(request)
+        return self.respond(url, request['params'], request['headers'])
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import QUEUE_FULL, QUEUE_STALLED, TIMED_OUT, AdmissionController, Overloaded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def hold(controller):
+    """Enter one admission and return its context, to be released with release()"""
+    slot = controller.admit()
+    slot.__enter__()
+    return slot
+
+
+def release(slot):
+    slot.__exit__(None, None, None)
+
+
+def wait_in_thread(controller, errors):
+    def run():
+        try:
+            with controller.admit():
+                pass
+        except Overloaded as e:
+            errors.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_full_queue_sheds_at_once():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_queued=0)
+    slot = hold(controller)
+    with pytest.raises(Overloaded) as shed:
+        with controller.admit():
+            pass
+    assert shed.value.reason == QUEUE_FULL
+    assert shed.value.retry_after >= 1
+    release(slot)
+    assert controller.metrics()['shed'] == {QUEUE_FULL: 1, QUEUE_STALLED: 0, TIMED_OUT: 0, 'total': 1}
+
+
+def test_stalled_queue_sheds_new_requests():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_wait=0.4)
+    slot = hold(controller)
+    errors = []
+    waiter = wait_in_thread(controller, errors)
+    wait_until(lambda: controller.metrics()['queued'] == 1)
+    time.sleep(0.25)
+
+    with pytest.raises(Overloaded) as shed:
+        with controller.admit():
+            pass
+    assert shed.value.reason == QUEUE_STALLED
+
+    # The queued request gets the freed slot
+    release(slot)
+    waiter.join()
+    assert errors == []
+    assert controller.metrics()['admitted'] == 2
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_wait=0.1)
+    slot = hold(controller)
+    errors = []
+    wait_in_thread(controller, errors).join()
+    assert [e.reason for e in errors] == [TIMED_OUT]
+    assert controller.metrics()['queued'] == 0
+
+    release(slot)
+    assert controller.metrics()['in_flight'] == 0
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_used(monkeypatch):
+    controller = AdmissionController(initial_limit=1, min_limit=1)
+    slot = hold(controller)
+
+    class HandedOverOnTimeout(admission._Waiter):
+        """Waiter whose slot is freed and handed to it just as its wait times out"""
+
+        def __init__(self):
+            super().__init__()
+            event = self.event
+
+            class Event:
+                def wait(self, timeout):
+                    release(slot)
+                    return False
+
+                def set(self):
+                    event.set()
+
+            self.event = Event()
+
+    monkeypatch.setattr(admission, '_Waiter', HandedOverOnTimeout)
+    with controller.admit():
+        assert controller.metrics()['in_flight'] == 1
+    metrics = controller.metrics()
+    assert metrics['in_flight'] == 0
+    assert metrics['admitted'] == 2
+    assert metrics['shed']['total'] == 0
+
+
+def test_limit_shrinks_when_latency_rises(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, 'time', clock)
+    controller = AdmissionController(initial_limit=20, min_limit=4, max_limit=100)
+
+    def request(latency):
+        with controller.admit():
+            clock.now += latency
+
+    for _ in range(50):
+        request(0.05)
+    baseline = controller.limit
+    for _ in range(20):
+        request(1.0)
+    assert controller.limit < baseline
+    assert controller.limit >= 4
+    assert controller.metrics()['latency_ms']['recent'] > controller.metrics()['latency_ms']['baseline']
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+
+from arxiv_mirror import ArxivMirror, OAIHarvester, mirror_lag
+from conftest import FakeResponse, FakeSession
+
+PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <responseDate>{response_date}</responseDate>
+  <ListRecords>{records}<resumptionToken>{token}</resumptionToken></ListRecords>
+</OAI-PMH>"""
+
+RECORD = """
+<record>
+  <header><identifier>oai:arXiv.org:{arxiv_id}</identifier><datestamp>{datestamp}</datestamp></header>
+  <metadata>
+    <arXiv xmlns="http://arxiv.org/OAI/arXiv/">
+      <id>{arxiv_id}</id><created>{datestamp}</created>
+      <authors><author><keyname>Hinton</keyname><forenames>Geoffrey</forenames></author></authors>
+      <title>{title}</title><categories>cs.LG</categories><abstract>About {title}.</abstract>
+    </arXiv>
+  </metadata>
+</record>"""
+
+DELETED = """
+<record>
+  <header status="deleted"><identifier>oai:arXiv.org:{arxiv_id}</identifier><datestamp>{datestamp}</datestamp></header>
+</record>"""
+
+NO_RECORDS = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <responseDate>{response_date}</responseDate>
+  <error code="noRecordsMatch">No records</error>
+</OAI-PMH>"""
+
+
+def oai_time(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakeOAI(FakeSession):
+    """OAI-PMH stand-in serving a list of pages chained by resumption tokens"""
+
+    def __init__(self, pages, response_date='2024-03-02T10:00:00Z'):
+        super().__init__(self.answer)
+        self.pages = pages
+        self.response_date = response_date
+
+    def answer(self, url, params, headers):
+        if not self.pages:
+            return FakeResponse(content=NO_RECORDS.format(response_date=self.response_date).encode('utf-8'))
+        number = int(params['resumptionToken']) if 'resumptionToken' in params else 0
+        records = ''.join(self.pages[number])
+        token = str(number + 1) if number + 1 < len(self.pages) else ''
+        page = PAGE.format(response_date=self.response_date, records=records, token=token)
+        return FakeResponse(content=page.encode('utf-8'))
+
+
+def record(arxiv_id, title, datestamp='2024-03-01'):
+    return RECORD.format(arxiv_id=arxiv_id, title=title, datestamp=datestamp)
+
+
+def test_interrupted_harvest_resumes_from_its_token(tmp_path):
+    mirror = ArxivMirror(str(tmp_path / 'mirror.db'))
+    session = FakeOAI([[record('2403.00001', 'Graph neural networks')],
+                       [record('2403.00002', 'Protein folding')]])
+    harvester = OAIHarvester(mirror, 'http://oai.test/', session=session)
+
+    assert harvester.harvest(max_pages=1) == 1
+    assert mirror.get_state('resumption_token') == '1'
+    assert mirror.synced_through() is None
+
+    assert harvester.harvest() == 1
+    assert session.requests[-1]['params'] == {'verb': 'ListRecords', 'resumptionToken': '1'}
+    assert mirror.count() == 2
+    assert mirror.get_state('resumption_token') is None
+    assert mirror.search('protein')[0]['authors'] == ['Geoffrey Hinton']
+    # The resumed run is as current as the listing it continued
+    assert mirror.synced_through() == datetime(2024, 3, 2, 10, tzinfo=timezone.utc)
+
+
+def test_deleted_records_are_removed(tmp_path):
+    mirror = ArxivMirror(str(tmp_path / 'mirror.db'))
+    OAIHarvester(mirror, 'http://oai.test/', session=FakeOAI([[record('2403.00001', 'Graph neural networks')]])).harvest()
+
+    deleted = DELETED.format(arxiv_id='2403.00001', datestamp='2024-03-02')
+    session = FakeOAI([[deleted]])
+    OAIHarvester(mirror, 'http://oai.test/', session=session).harvest()
+    assert session.requests[0]['params']['from'] == '2024-03-01'
+    assert mirror.count() == 0
+    assert mirror.search('graph') == []
+
+
+def test_harvest_without_new_records_counts_as_current(tmp_path):
+    mirror = ArxivMirror(str(tmp_path / 'mirror.db'))
+    OAIHarvester(mirror, 'http://oai.test/',
+                 session=FakeOAI([[record('2403.00001', 'Graph neural networks', '2024-01-01')]])).harvest()
+
+    now = datetime.now(timezone.utc)
+    OAIHarvester(mirror, 'http://oai.test/', session=FakeOAI([], oai_time(now))).harvest()
+    assert mirror_lag(mirror) < timedelta(minutes=1)
+    # The next run still asks for changes since the newest record
+    assert mirror.get_state('datestamp') == '2024-01-01'
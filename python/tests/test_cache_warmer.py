@@ -0,0 +1,22 @@
+from cache_warmer import CacheWarmer, SpaceSaving
+
+
+class IdleService:
+    cache = None
+
+
+def test_space_saving_keeps_heavy_hitters():
+    sketch = SpaceSaving(capacity=2)
+    for key in ['a', 'a', 'a', 'b', 'c']:
+        sketch.add(key)
+    assert sketch.top(1) == [('a', 3)]
+    sketch.decay()
+    assert sketch.counts == {'a': 1, 'c': 1}
+
+
+def test_decay_forgets_queries_dropped_from_the_sketch():
+    warmer = CacheWarmer(IdleService(), top_n=0, decay_every=1)
+    for query in ['graph neural networks', 'graph neural networks', 'protein folding']:
+        warmer.record(query, 10)
+    warmer.warm_once()
+    assert set(warmer._queries) == set(warmer.sketch.counts) == {'graph networks neural'}
@@ -0,0 +1,94 @@
+from citation_graph import AdjacencyStore, CitationGraph, work_id
+from conftest import FakeResponse, FakeSession
+
+# W1 references W2, W3 references W1
+WORKS = {
+    1: {'referenced_works': [work_id(2)], 'doi': 'https://doi.org/10.1000/one'},
+    2: {'referenced_works': []},
+    3: {'referenced_works': [work_id(1)]},
+}
+
+
+class FakeOpenAlex(FakeSession):
+    """Answers the openalex_id:, cites: and doi: filters the graph sends"""
+
+    def __init__(self, fail_status=None, fail_filters=()):
+        super().__init__(self.answer)
+        self.fail_status = fail_status
+        self.fail_filters = fail_filters
+
+    def answer(self, url, params, headers):
+        if self.fail_status:
+            return FakeResponse({}, self.fail_status)
+        if params['filter'] in self.fail_filters:
+            return FakeResponse({}, 500)
+        name, values = params['filter'].split(':', 1)
+        values = values.split('|')
+        if name == 'openalex_id':
+            numbers = [int(value[1:]) for value in values]
+        elif name == 'cites':
+            cited = {work_id(int(value[1:])) for value in values}
+            numbers = [number for number, work in WORKS.items() if cited & set(work['referenced_works'])]
+        else:
+            numbers = [number for number, work in WORKS.items()
+                       if work.get('doi', '').replace('https://doi.org/', '') in values]
+        results = [self._work(number) for number in numbers if number in WORKS]
+        return FakeResponse({'results': results, 'meta': {'next_cursor': None}})
+
+    @staticmethod
+    def _work(number):
+        return dict(WORKS[number], id=work_id(number), title=f'Work {number}', authorships=[])
+
+
+def expand(session, *args, **kwargs):
+    graph = CitationGraph(session, AdjacencyStore(), max_workers=2)
+    return list(graph.expand(*args, **kwargs))
+
+
+def test_each_edge_is_sent_once_in_both_directions():
+    events = expand(FakeOpenAlex(), ['W1'], direction='both', depth=2)
+    edges = [(event['source'], event['target']) for event in events if event['type'] == 'edge']
+    assert sorted(edges) == [(work_id(1), work_id(2)), (work_id(3), work_id(1))]
+    done = events[-1]
+    assert done['type'] == 'done'
+    assert done['edges'] == 2
+    assert done['nodes'] == 3
+
+
+def test_references_only_follow_outgoing_edges():
+    events = expand(FakeOpenAlex(), ['https://openalex.org/W1'], direction='references', depth=1)
+    nodes = [event['paper']['id'] for event in events if event['type'] == 'node']
+    assert nodes == [work_id(1), work_id(2)]
+
+
+def test_doi_seeds_are_resolved():
+    events = expand(FakeOpenAlex(), ['10.1000/one'], direction='references', depth=1)
+    assert events[0]['type'] == 'node'
+    assert events[0]['paper']['id'] == work_id(1)
+
+
+def test_failed_seed_lookup_still_ends_with_done():
+    events = expand(FakeOpenAlex(fail_status=500), ['10.1000/one'], direction='references')
+    assert len(events) == 1
+    assert events[0]['type'] == 'done'
+    assert events[0]['nodes'] == 0
+    assert 'error' in events[0]
+
+
+def test_edges_to_failed_nodes_are_not_sent():
+    events = expand(FakeOpenAlex(fail_filters=['openalex_id:W2']), ['W1'], direction='references', depth=1)
+    assert [event['type'] for event in events] == ['node', 'done']
+    assert events[-1]['truncated'] == 'failed_batches'
+    assert events[-1]['failed_batches'] == 1
+    assert events[-1]['edges'] == 0
+
+
+def test_edges_follow_their_nodes():
+    events = expand(FakeOpenAlex(), ['W1'], direction='both', depth=2)
+    sent = set()
+    for event in events:
+        if event['type'] == 'node':
+            sent.add(event['paper']['id'])
+        elif event['type'] == 'edge':
+            assert {event['source'], event['target']} <= sent
+    assert events[-1]['truncated'] is None
@@ -0,0 +1,32 @@
+from conftest import FakeResponse, FakeSession
+from enrichment import PaperEnricher
+
+
+class FakeOpenAlex(FakeSession):
+    def __init__(self):
+        super().__init__(self.answer)
+
+    @staticmethod
+    def answer(url, params, headers):
+        dois = params['filter'][len('doi:'):].split('|')
+        return FakeResponse({'results': [{'doi': f'https://doi.org/{doi}', 'cited_by_count': 7} for doi in dois]})
+
+
+def paper(number):
+    return {'id': f'10.1000/{number}', 'citations': 0}
+
+
+def test_lookups_are_cached_and_bounded():
+    session = FakeOpenAlex()
+    enricher = PaperEnricher(session=session, max_entries=2)
+    papers = enricher.enrich([paper(1), paper(2)])
+    assert [p['citations'] for p in papers] == [7, 7]
+
+    enricher.enrich([paper(1)])
+    assert len(session.requests) == 1
+
+    # 3 pushes out 2, the least recently used
+    enricher.enrich([paper(3)])
+    assert list(enricher._cache) == ['10.1000/1', '10.1000/3']
+    enricher.enrich([paper(2)])
+    assert len(session.requests) == 3
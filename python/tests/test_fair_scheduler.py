@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from fair_scheduler import BACKGROUND, INTERACTIVE, OTHER_TENANTS, SchedulerTimeout, SourceScheduler
+
+
+def use(scheduler, tenant, times=1, priority=INTERACTIVE):
+    for _ in range(times):
+        with scheduler.slot(tenant, priority, max_wait=5):
+            pass
+
+
+def test_tenant_stats_are_bounded():
+    scheduler = SourceScheduler('test', rate=1000, max_tenants=2)
+    for tenant in ('ip:1', 'ip:2', 'ip:3'):
+        use(scheduler, tenant)
+
+    tenants = scheduler.metrics()['tenants']
+    assert set(tenants) == {'ip:2', 'ip:3', OTHER_TENANTS}
+    assert tenants[OTHER_TENANTS]['granted'] == 1
+
+
+def test_idle_tenants_are_folded_into_other():
+    scheduler = SourceScheduler('test', rate=1000, stats_idle=60)
+    use(scheduler, 'ip:1', times=2)
+    use(scheduler, 'ip:2')
+    scheduler._stats['ip:1'].last_seen -= 120
+
+    tenants = scheduler.metrics()['tenants']
+    assert set(tenants) == {'ip:2', OTHER_TENANTS}
+    assert tenants[OTHER_TENANTS]['granted'] == 2
+    assert 'ip:1' not in scheduler._stats
+
+
+def test_only_the_busiest_tenants_are_listed():
+    scheduler = SourceScheduler('test', rate=1000, max_reported=1)
+    use(scheduler, 'ip:1')
+    use(scheduler, 'ip:2', times=3)
+    use(scheduler, 'ip:3', priority=BACKGROUND)
+
+    tenants = scheduler.metrics()['tenants']
+    assert list(tenants) == ['ip:2', OTHER_TENANTS]
+    assert tenants[OTHER_TENANTS]['granted'] == 2
+    # Listing is not pruning
+    assert set(scheduler._stats) == {'ip:1', 'ip:2', 'ip:3'}
+
+
+def granted_order(scheduler, tickets):
+    """Queue (tenant, priority) tickets behind a held slot, release it and return the order they ran in"""
+    held = scheduler.slot('holder', INTERACTIVE)
+    held.__enter__()
+    order = []
+    threads = []
+    for number, (tenant, priority) in enumerate(tickets, 1):
+        def run(tenant=tenant, priority=priority):
+            with scheduler.slot(tenant, priority, max_wait=5):
+                order.append(tenant)
+        threads.append(threading.Thread(target=run))
+        threads[-1].start()
+        wait_until(lambda: scheduler.metrics()['queued'] == number)
+    held.__exit__(None, None, None)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_tenants_take_turns():
+    scheduler = SourceScheduler('test', rate=1000, max_in_flight=1)
+    order = granted_order(scheduler, [('a', INTERACTIVE)] * 3 + [('b', INTERACTIVE)] * 2)
+    assert order == ['a', 'b', 'a', 'b', 'a']
+
+
+def test_weights_give_tenants_longer_turns():
+    scheduler = SourceScheduler('test', rate=1000, max_in_flight=1, weights={'a': 2})
+    order = granted_order(scheduler, [('a', INTERACTIVE)] * 4 + [('b', INTERACTIVE)] * 2)
+    assert order == ['a', 'a', 'b', 'a', 'a', 'b']
+
+
+def test_interactive_requests_go_before_background():
+    scheduler = SourceScheduler('test', rate=1000, max_in_flight=1)
+    order = granted_order(scheduler, [('batch', BACKGROUND)] * 2 + [('user', INTERACTIVE)] * 2)
+    assert order == ['user', 'user', 'batch', 'batch']
+
+
+def test_timed_out_requests_are_counted_and_dequeued():
+    scheduler = SourceScheduler('test', rate=1000, max_in_flight=1)
+    held = scheduler.slot('holder', INTERACTIVE)
+    held.__enter__()
+    with pytest.raises(SchedulerTimeout):
+        with scheduler.slot('ip:1', INTERACTIVE, max_wait=0.05):
+            pass
+    held.__exit__(None, None, None)
+
+    metrics = scheduler.metrics()
+    assert metrics['queued'] == 0
+    assert metrics['tenants']['ip:1']['timed_out'] == 1
+    assert metrics['tenants']['ip:1']['granted'] == 0
+    # The source is not left with a phantom request in flight
+    use(scheduler, 'ip:1')
+    assert scheduler.metrics()['in_flight'] == 0
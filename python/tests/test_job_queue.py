@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFull
+
+
+def double(params, progress):
+    progress(1, 1)
+    return {'value': params['value'] * 2}
+
+
+def fail(params, progress):
+    raise RuntimeError('upstream down')
+
+
+def wait_for(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)['status'] != status:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_queued_jobs_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    # Submitted, but the process stops before a worker claims it
+    job_id = JobQueue({'double': double}, db_path).submit('double', {'value': 21})
+
+    restarted = JobQueue({'double': double}, db_path, poll_interval=0.01)
+    restarted.start()
+    try:
+        job = wait_for(restarted, job_id, DONE)
+    finally:
+        restarted.stop()
+    assert job['result'] == {'value': 42}
+    assert job['progress'] == {'done': 1, 'total': 1}
+    # Results are read from the database, not from the queue that ran the job
+    assert JobQueue({'double': double}, db_path).get(job_id)['result'] == {'value': 42}
+
+
+def test_jobs_of_dead_workers_are_requeued(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    dead = JobQueue({'double': double}, db_path)
+    job_id = dead.submit('double', {'value': 2})
+    # Claimed by a worker whose process then dies without finishing it
+    assert dead._claim()['id'] == job_id
+    assert dead.get(job_id)['status'] == RUNNING
+
+    survivor = JobQueue({'double': double}, db_path, poll_interval=0.01,
+                        heartbeat_interval=0.05, stale_after=0.1)
+    survivor.start()
+    try:
+        job = wait_for(survivor, job_id, DONE)
+    finally:
+        survivor.stop()
+    assert job['result'] == {'value': 4}
+
+
+def test_failed_jobs_keep_their_error(tmp_path):
+    queue = JobQueue({'fail': fail}, str(tmp_path / 'jobs.db'), poll_interval=0.01)
+    job_id = queue.submit('fail', {})
+    queue.start()
+    try:
+        job = wait_for(queue, job_id, FAILED)
+    finally:
+        queue.stop()
+    assert job['error'] == 'upstream down'
+    assert 'result' not in job
+
+
+def test_submissions_beyond_max_queued_are_rejected(tmp_path):
+    queue = JobQueue({'double': double}, str(tmp_path / 'jobs.db'), max_queued=2)
+    first = queue.submit('double', {'value': 1})
+    second = queue.submit('double', {'value': 2})
+    with pytest.raises(QueueFull):
+        queue.submit('double', {'value': 3})
+    assert queue.get(first)['status'] == QUEUED
+    assert queue.get(second)['queue_position'] == 1
@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+import json_codec
+from conftest import FakeResponse
+from json_codec import iter_array, iter_response_items
+
+pytest.importorskip('ijson')
+
+ITEMS = [
+    {'id': 'a', 'title': 'Graph theory',
+     'authors': [{'name': 'Ada', 'affiliation': {'id': 'x', 'title': 'Nested title'}}],
+     'meta': {'counts': [1, 2], 'id': 'nested'}},
+    {'title': 'No id', 'abstract': None, 'year': 2024},
+    {},
+]
+
+
+def stream(data):
+    return io.BytesIO(json.dumps(data).encode('utf-8'))
+
+
+def test_all_fields_are_decoded_without_a_selection():
+    assert list(iter_array(stream({'message': {'items': ITEMS}}), 'message.items')) == ITEMS
+
+
+def test_unselected_fields_are_skipped_at_any_depth():
+    items = list(iter_array(stream({'message': {'items': ITEMS}}), 'message.items', fields=['id', 'title', 'year']))
+    # Keys named like selected fields inside skipped objects do not leak into the item
+    assert items == [{'id': 'a', 'title': 'Graph theory'}, {'title': 'No id', 'year': 2024}, {}]
+
+
+def test_selected_fields_keep_their_nested_values():
+    items = list(iter_array(stream({'results': ITEMS}), 'results', fields=['authors', 'meta']))
+    assert items[0] == {'authors': ITEMS[0]['authors'], 'meta': ITEMS[0]['meta']}
+    assert items[1:] == [{}, {}]
+
+
+def test_responses_are_decoded_whole_without_ijson(monkeypatch):
+    monkeypatch.setattr(json_codec, 'ijson', None)
+    response = FakeResponse({'message': {'items': ITEMS}})
+    assert list(iter_response_items(response, 'message.items', fields=['id'])) == ITEMS
+    assert list(iter_response_items(FakeResponse({'message': {}}), 'message.items')) == []
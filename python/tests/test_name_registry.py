@@ -0,0 +1,48 @@
+from name_registry import NameRegistry
+
+PAPERS = [
+    {'id': 'a', 'authors': ['Geoffrey E. Hinton', 'Yann LeCun'], 'journal': 'Nature'},
+    {'id': 'b', 'authors': ['Hinton, Geoffrey E.'], 'journal': 'NeurIPS'},
+    {'id': 'c', 'authors': ['Bernhard Schölkopf'], 'journal': 'nature'},
+    {'authors': ['Geoffrey E. Hinton'], 'journal': 'Nature'},
+]
+
+
+def ids(papers):
+    return [paper['id'] for paper in papers]
+
+
+def test_filter_by_author_and_venue():
+    registry = NameRegistry()
+    papers = [dict(paper) for paper in PAPERS]
+
+    # Unknown papers are registered by the filter itself; papers without an id never match
+    assert ids(registry.filter(papers, author='geoffrey e hinton')) == ['a', 'b']
+    assert ids(registry.filter(papers, author='Hinton')) == ['a', 'b']
+    assert ids(registry.filter(papers, author='Scholkopf, Bernhard')) == ['c']
+    assert ids(registry.filter(papers, venue='NATURE')) == ['a', 'c']
+    assert ids(registry.filter(papers, author='Hinton', venue='Nature')) == ['a']
+    assert registry.filter(papers, author='Nobody') == []
+    assert registry.filter(papers) is papers
+
+
+def test_registered_papers_are_bounded():
+    registry = NameRegistry(max_papers=2)
+    registry.add_papers([dict(paper) for paper in PAPERS[:3]])
+
+    # 'a' was registered first and is forgotten, along with the names and spellings only it used
+    assert list(registry._papers) == ['b', 'c']
+    assert registry.author_id('Yann LeCun') is None
+    assert registry.author_id('Hinton, Geoffrey E.') is not None
+    assert registry.stats() == {'authors': 2, 'venues': 2, 'spellings': 4, 'papers': 2}
+
+
+def test_vocabulary_stays_bounded():
+    registry = NameRegistry(max_papers=10)
+    for number in range(1000):
+        registry.add_papers([{'id': str(number), 'authors': [f'Author {number}', 'Shared Name'],
+                              'journal': f'Venue {number}'}])
+
+    assert registry.stats() == {'authors': 11, 'venues': 10, 'spellings': 21, 'papers': 10}
+    assert len(registry._families) == 11
+    assert len(registry._authors.papers[registry.author_id('Shared Name')]) == 10
@@ -0,0 +1,67 @@
+import hashlib
+
+from conftest import FakeResponse, FakeSession
+from pdf_pipeline import PdfPipeline, PdfStore
+
+URL = 'https://example.org/paper.pdf'
+OLD = b'%PDF-1.4 old version of the paper' * 10
+NEW = b'%PDF-1.4 new version, different length' * 10
+
+
+class FakeServer(FakeSession):
+    """Serves one file with a strong ETag, honouring Range and If-Range"""
+
+    def __init__(self, body, etag):
+        super().__init__(self.answer)
+        self.body = body
+        self.etag = etag
+
+    def answer(self, url, params, headers):
+        full = FakeResponse(status_code=200, content=self.body, headers={'ETag': self.etag})
+        if 'Range' not in headers or headers.get('If-Range', self.etag) != self.etag:
+            return full
+        start = int(headers['Range'][len('bytes='):-1])
+        if start >= len(self.body):
+            return FakeResponse(status_code=416)
+        return FakeResponse(status_code=206, content=self.body[start:], headers={'ETag': self.etag})
+
+
+def interrupted_download(store, body, etag):
+    """Leave the first half of body as a partial download started under etag"""
+    partial_path = store.partial_path(URL)
+    with open(partial_path, 'wb') as f:
+        f.write(body[:len(body) // 2])
+    with open(store.validator_path(partial_path), 'w', encoding='utf-8') as f:
+        f.write(etag)
+
+
+def test_unchanged_file_is_resumed(tmp_path):
+    store = PdfStore(str(tmp_path))
+    interrupted_download(store, OLD, '"v1"')
+    server = FakeServer(OLD, '"v1"')
+
+    digest = PdfPipeline(store, session=server)._download(URL)
+    assert digest == hashlib.sha256(OLD).hexdigest()
+    assert server.requests[0]['headers'] == {'Range': f'bytes={len(OLD) // 2}-', 'If-Range': '"v1"'}
+
+
+def test_changed_file_is_downloaded_again(tmp_path):
+    store = PdfStore(str(tmp_path))
+    interrupted_download(store, OLD, '"v1"')
+    server = FakeServer(NEW, '"v2"')
+
+    digest = PdfPipeline(store, session=server)._download(URL)
+    assert digest == hashlib.sha256(NEW).hexdigest()
+    with open(store.path_for(digest), 'rb') as f:
+        assert f.read() == NEW
+
+
+def test_partial_without_validator_is_not_resumed(tmp_path):
+    store = PdfStore(str(tmp_path))
+    with open(store.partial_path(URL), 'wb') as f:
+        f.write(OLD[:10])
+    server = FakeServer(NEW, '"v2"')
+
+    digest = PdfPipeline(store, session=server)._download(URL)
+    assert digest == hashlib.sha256(NEW).hexdigest()
+    assert 'Range' not in server.requests[0]['headers']
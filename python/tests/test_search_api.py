@@ -0,0 +1,112 @@
+import importlib
+import time
+
+import pytest
+
+from conftest import FakeResponse, FakeSession
+
+
+OPENALEX_PAGE = {
+    'results': [{
+        'id': 'https://openalex.org/W2100837269',
+        'title': 'Reducing the Dimensionality of Data with Neural Networks',
+        'publication_year': 2006,
+        'cited_by_count': 20000,
+        'doi': 'https://doi.org/10.1126/science.1127647',
+        'authorships': [
+            {'author': {'display_name': 'Geoffrey E. Hinton'}},
+            {'author': {'display_name': 'Ruslan Salakhutdinov'}}
+        ],
+        'primary_location': {'source': {'display_name': 'Science'}}
+    }, {
+        'id': 'https://openalex.org/W1',
+        'title': 'A paper without a venue',
+        'publication_year': 2020,
+        'authorships': [{'author': {'display_name': 'Someone Else'}}],
+        'primary_location': None
+    }]
+}
+
+
+@pytest.fixture(params=['improved_app', 'improved_search'])
+def app_module(request, monkeypatch):
+    module = importlib.import_module(request.param)
+    service = module.search_service
+    monkeypatch.setattr(service, 'session', FakeSession(lambda url, params, headers: FakeResponse(OPENALEX_PAGE)))
+    # Only OpenAlex answers here; skip pygetpapers in improved_search
+    monkeypatch.setattr(service, '_fetch_source', _openalex_only(service._fetch_source), raising=False)
+    service.cache._entries.clear()
+    service.source_cache = type(service.source_cache)(service.cache_duration)
+    return module
+
+
+def _openalex_only(fetch_source):
+    def fetch(source, *args, **kwargs):
+        if source != 'openalex':
+            raise Exception(f"{source} disabled in tests")
+        return fetch_source(source, *args, **kwargs)
+    return fetch
+
+
+def test_openalex_authors_and_venue_are_read(app_module):
+    client = app_module.app.test_client()
+    data = client.get('/api/search/papers?query=dimensionality+reduction').get_json()
+    assert data['source'] == 'openalex'
+    assert data['papers'][0]['authors'] == ['Geoffrey E. Hinton', 'Ruslan Salakhutdinov']
+    assert data['papers'][0]['journal'] == 'Science'
+    assert data['papers'][1]['journal'] == ''
+
+
+def test_author_filter_finds_openalex_paper(app_module):
+    client = app_module.app.test_client()
+    data = client.get('/api/search/papers?query=neural+networks+data&author=Hinton').get_json()
+    assert data['count'] == 1
+    assert data['papers'][0]['id'] == 'https://openalex.org/W2100837269'
+
+    data = client.get('/api/search/papers?query=neural+networks+data&venue=science').get_json()
+    assert [paper['id'] for paper in data['papers']] == ['https://openalex.org/W2100837269']
+    assert client.get('/metrics').get_json()['names']['authors'] >= 3
+
+
+def test_non_positive_limit_is_clamped(app_module):
+    client = app_module.app.test_client()
+    client.get('/api/search/papers?query=dimensionality+reduction&limit=2')
+    for limit in (-5, 0):
+        data = client.get(f'/api/search/papers?query=dimensionality+reduction&limit={limit}').get_json()
+        assert data['count'] == 1
+        assert len(data['papers']) == 1
+
+
+def wait_for_job(client, status_url, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job did not finish: {job}")
+
+
+def test_job_limit_is_clamped(app_module):
+    client = app_module.app.test_client()
+    client.get('/api/search/papers?query=dimensionality+reduction&limit=2')
+    response = client.post('/api/search/jobs', json={'queries': ['dimensionality reduction'], 'limit': -5})
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.get_json()['status_url'])
+    result = job['result']['results'][0]
+    assert result['count'] == 1
+    assert len(result['papers']) == 1
+
+
+@pytest.mark.parametrize('body', [['graph theory'], {'queries': 'graph theory'}, {'queries': ['graph theory', 3]}])
+def test_malformed_job_is_rejected(app_module, body):
+    response = app_module.app.test_client().post('/api/search/jobs', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_apps_keep_separate_job_queues():
+    import improved_app
+    import improved_search
+    assert improved_app.api.job_queue.db_path != improved_search.api.job_queue.db_path
@@ -0,0 +1,77 @@
+import gzip
+import time
+
+from search_cache import MIN_COMPRESS_SIZE, CacheEntry, SearchCache, json_response
+
+
+def result(count):
+    return {'success': True, 'papers': [{'id': str(number)} for number in range(count)], 'count': count}
+
+
+def test_least_recently_used_queries_are_evicted():
+    cache = SearchCache(3600, max_entries=2)
+    cache.store('graph theory', 5, result(5))
+    cache.store('black holes', 5, result(5))
+    assert cache.lookup('graph theory', 5)[0] is not None
+
+    cache.store('dark matter', 5, result(5))
+    assert list(cache._entries) == ['graph theory', 'dark matter']
+
+
+def test_expired_entries_are_peeked_until_max_stale():
+    cache = SearchCache(60, max_stale=60)
+    cache.store('graph theory', 5, result(5), timestamp=time.time() - 90)
+    assert cache.lookup('graph theory', 5) == (None, None)
+    # Still there for answers under load
+    assert cache.peek('graph theory') is not None
+
+    cache.store('black holes', 5, result(5), timestamp=time.time() - 130)
+    assert cache.peek('black holes') is None
+    assert 'black holes' not in cache._entries
+
+
+def test_long_expired_entries_are_dropped_on_store():
+    cache = SearchCache(60, max_stale=60)
+    cache.store('graph theory', 5, result(5), timestamp=time.time() - 130)
+    cache.store('black holes', 5, result(5))
+    assert list(cache._entries) == ['black holes']
+
+
+def fresh_entry(count=5):
+    return CacheEntry(result(count), max_age=60)
+
+
+def test_matching_etag_is_answered_with_not_modified():
+    entry = fresh_entry()
+    response = json_response(entry, {})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{entry.etag}"'
+
+    revalidated = json_response(entry, {'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+
+
+def test_compressed_and_weak_etags_match_the_entry():
+    entry = fresh_entry(200)
+    assert len(entry.body) >= MIN_COMPRESS_SIZE
+    response = json_response(entry, {'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] == f'"{entry.etag}-gzip"'
+    assert gzip.decompress(response.get_data()) == entry.body
+
+    # Proxies that recompress the body weaken the tag
+    for tag in (response.headers['ETag'], f'W/"{entry.etag}-gzip"', f'"other", W/"{entry.etag}"'):
+        revalidated = json_response(entry, {'If-None-Match': tag, 'Accept-Encoding': 'gzip'})
+        assert revalidated.status_code == 304
+        assert 'Content-Encoding' not in revalidated.headers
+
+
+def test_other_etags_and_failures_get_the_full_body():
+    entry = fresh_entry()
+    assert json_response(entry, {'If-None-Match': '"other-gzip"'}).status_code == 200
+
+    failed = json_response(entry, {'If-None-Match': f'"{entry.etag}"'}, status=500)
+    assert failed.status_code == 500
+    assert failed.get_data() == entry.body
+    assert 'ETag' not in failed.headers
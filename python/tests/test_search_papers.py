@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+import requests
+
+import search_papers
+from source_cache import ERROR, THROTTLED, CachedFailure, SourceCache
+
+PAPER = {'id': '10.1000/one', 'title': 'One', 'authors': ['A Author'], 'year': '2020'}
+
+
+class NoWait:
+    def wait(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch, tmp_path):
+    monkeypatch.setenv('ARXIV_MIRROR_DB', str(tmp_path / 'no-mirror.db'))
+    monkeypatch.setattr(search_papers, 'RATE_LIMITS', {'arxiv': NoWait(), 'crossref': NoWait()})
+    monkeypatch.setattr(search_papers, 'source_cache', SourceCache(max_age=3600))
+
+
+def status_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b''
+    response.raw = io.BytesIO(b'')
+    return response
+
+
+def run(queries, tmp_path):
+    output = io.BytesIO()
+    checkpoint = tmp_path / 'batch.checkpoint'
+    counts = search_papers.run_batch(queries, output, str(checkpoint), workers=2, enrich=False)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    return counts, records, search_papers.load_checkpoint(str(checkpoint))
+
+
+def test_query_with_every_source_down_is_retried(monkeypatch, tmp_path):
+    def unreachable(self, url, **kwargs):
+        raise requests.exceptions.ConnectionError("connection refused")
+    monkeypatch.setattr(requests.Session, 'get', unreachable)
+
+    (completed, failed), records, done = run(['graph neural networks'], tmp_path)
+    assert (completed, failed) == (1, 1)
+    assert 'error' in records[0]
+    assert done == set()
+
+
+def test_query_answered_by_one_source_is_checkpointed(monkeypatch, tmp_path):
+    def arxiv_down(query, max_results=10):
+        raise Exception("arXiv search timed out")
+    monkeypatch.setattr(search_papers, 'search_arxiv', arxiv_down)
+    monkeypatch.setattr(search_papers, 'search_crossref', lambda query, max_results=10: [dict(PAPER)])
+
+    (completed, failed), records, done = run(['graph neural networks', 'graph neural networks'], tmp_path)
+    assert (completed, failed) == (1, 0)
+    assert records[0]['count'] == 1
+    assert done == {'graph neural networks'}
+
+    # A rerun skips what the checkpoint lists
+    (completed, failed), records, _ = run(['graph neural networks'], tmp_path)
+    assert (completed, failed, records) == (0, 0, [])
+
+
+def test_throttled_crossref_response_is_cached_as_throttled(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get',
+                        lambda self, url, **kwargs: status_response(429, {'Retry-After': '30'}))
+    cache = search_papers.source_cache
+    fetch = lambda: search_papers.search_crossref('graph neural networks')
+
+    with pytest.raises(Exception):
+        cache.fetch('crossref', 'graph neural networks', (0, 10), fetch)
+    with pytest.raises(CachedFailure) as cached:
+        cache.fetch('crossref', 'graph neural networks', (0, 10), fetch)
+    assert cached.value.kind == THROTTLED
+    assert cache.stats()['lookups'][THROTTLED] == 1
+
+
+def test_arxiv_server_error_is_cached_as_error(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', lambda self, url, **kwargs: status_response(500))
+    cache = search_papers.source_cache
+    fetch = lambda: search_papers.search_arxiv('graph neural networks')
+
+    with pytest.raises(Exception):
+        cache.fetch('arxiv', 'graph neural networks', (0, 10), fetch)
+    with pytest.raises(CachedFailure) as cached:
+        cache.fetch('arxiv', 'graph neural networks', (0, 10), fetch)
+    assert cached.value.kind == ERROR
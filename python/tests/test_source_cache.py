@@ -0,0 +1,83 @@
+import pytest
+import requests
+
+from source_cache import EMPTY, ERROR, OK, THROTTLED, CachedFailure, SourceCache, canonicalize_query
+
+
+def test_separators_case_and_order_are_folded():
+    assert canonicalize_query('Machine  Learning') == canonicalize_query('learning, machine')
+    assert canonicalize_query('state-of-the-art  models') == canonicalize_query('models state of the art')
+    assert canonicalize_query('ＤＥＥＰ learning') == 'deep learning'
+
+
+def test_symbols_stay_part_of_their_term():
+    keys = {canonicalize_query(query) for query in ('C++ programming', 'C# programming', 'C programming')}
+    assert len(keys) == 3
+    assert canonicalize_query('C++ Programming') == canonicalize_query('programming c++')
+
+
+def test_phrases_and_boolean_queries_keep_term_order():
+    assert canonicalize_query('"neural networks" graph') != canonicalize_query('graph "neural networks"')
+    assert canonicalize_query('vision AND language') != canonicalize_query('language AND vision')
+
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+def not_fetched():
+    pytest.fail("a cached piece was fetched again")
+
+
+def failing(error):
+    def fetch():
+        try:
+            raise error
+        except Exception as e:
+            # Adapters wrap upstream errors, the cause keeps the response
+            raise Exception(f"search failed: {e}") from e
+    return fetch
+
+
+def test_results_and_empty_results_are_told_apart():
+    cache = SourceCache()
+    cache.fetch('openalex', 'graphs', 0, lambda: {'success': True, 'papers': [{'id': 'W1'}]})
+    cache.fetch('openalex', 'nothing', 0, lambda: {'success': True, 'papers': []})
+    value, _ = cache.fetch('openalex', 'graphs', 0, not_fetched)
+    assert value['papers'] == [{'id': 'W1'}]
+    cache.fetch('openalex', 'nothing', 0, not_fetched)
+    lookups = cache.stats()['lookups']
+    assert (lookups['miss'], lookups[OK], lookups[EMPTY]) == (2, 1, 1)
+
+
+@pytest.mark.parametrize('error, kind, ttl', [
+    (http_error(500), ERROR, 60),
+    (requests.exceptions.ConnectionError("refused"), ERROR, 60),
+    (http_error(429, '30'), THROTTLED, 30),
+    (http_error(503), THROTTLED, 120),
+])
+def test_failures_are_cached_by_kind(error, kind, ttl):
+    cache = SourceCache(error_ttl=60, throttled_ttl=120)
+    with pytest.raises(Exception):
+        cache.fetch('crossref', 'graphs', 0, failing(error))
+    with pytest.raises(CachedFailure) as cached:
+        cache.fetch('crossref', 'graphs', 0, not_fetched)
+    assert cached.value.kind == kind
+    fetched_at, expires = next(iter(cache._entries.values()))[:2]
+    assert expires - fetched_at == pytest.approx(ttl)
+
+
+def test_uncacheable_errors_are_not_cached():
+    class LocalTimeout(Exception):
+        pass
+
+    cache = SourceCache(uncacheable=(LocalTimeout,))
+    with pytest.raises(Exception):
+        cache.fetch('openalex', 'graphs', 0, failing(LocalTimeout()))
+    value, _ = cache.fetch('openalex', 'graphs', 0, lambda: {'success': True, 'papers': []})
+    assert value['papers'] == []
@@ -0,0 +1,10 @@
+from suggest_index import QUERY, SuggestIndex
+
+
+def test_queries_are_suggested_with_collapsed_whitespace():
+    index = SuggestIndex()
+    index.add_query('  graph   neural\tnetworks ')
+    index.add_query('Graph Neural Networks')
+
+    suggestions = index.suggest('neur')
+    assert [(s['type'], s['text']) for s in suggestions] == [(QUERY, 'graph neural networks')]
@@ -0,0 +1,89 @@
+import concurrent.futures
+import importlib
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class Prewarmer:
+    """Background startup warmup for a search worker
+
+    Resolves the DNS names of the upstream APIs, opens keep-alive
+    connections to them in the shared requests session (so the first
+    search skips the TCP and TLS handshakes) and imports lazily loaded
+    modules that will be needed. Failures are recorded but never block
+    readiness; a worker that cannot warm up still serves requests.
+    """
+
+    def __init__(self, session: requests.Session, urls: List[str], modules: Optional[List[str]] = None,
+                 timeout: float = 5):
+        self.session = session
+        self.urls = urls
+        self.modules = modules or []
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        """Whether warmup has finished"""
+        return self._done.is_set()
+
+    def start(self):
+        """Run warmup in a daemon thread"""
+        threading.Thread(target=self._run, name='prewarm', daemon=True).start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warmup has finished or timeout passes"""
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """Warmup progress for the readiness endpoint"""
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return {
+            'ready': self.ready,
+            'warmup_seconds': round(end - self.started_at, 3),
+            'upstreams': dict(self.results)
+        }
+
+    def _run(self):
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(self.urls), 1)) as executor:
+                for url, result in zip(self.urls, executor.map(self._warm_url, self.urls)):
+                    self.results[url] = result
+            for module in self.modules:
+                try:
+                    importlib.import_module(module)
+                except ImportError as e:
+                    logger.info(f"Optional module {module} not available: {e}")
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+            logger.info(f"Warmup finished in {self.finished_at - self.started_at:.2f}s")
+
+    def _warm_url(self, url: str) -> Dict[str, Any]:
+        """Resolve a host and open a pooled connection to it"""
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        result: Dict[str, Any] = {}
+        try:
+            start = time.perf_counter()
+            socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+            result['dns_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+            # Any response leaves a keep-alive connection in the session's pool
+            start = time.perf_counter()
+            self.session.head(url, timeout=self.timeout, allow_redirects=False)
+            result['connect_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        except (OSError, requests.exceptions.RequestException) as e:
+            result['error'] = str(e)
+        return result
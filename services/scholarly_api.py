@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from scholarly_service import ScholarlyService
 from pydantic import BaseModel
 from typing import List, Optional
+import importlib
+import threading
 
 app = FastAPI()
 
@@ -15,6 +17,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Set once the scholarly package has been imported in the background
+scholarly_ready = threading.Event()
+
+def _prewarm_scholarly():
+    try:
+        importlib.import_module("scholarly")
+    finally:
+        scholarly_ready.set()
+
+@app.on_event("startup")
+async def prewarm():
+    # Import the heavy scholarly package off the request path so startup stays fast
+    threading.Thread(target=_prewarm_scholarly, daemon=True).start()
+
+@app.get("/ready")
+async def ready():
+    if not scholarly_ready.is_set():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"ready": True}
+
 class SearchQuery(BaseModel):
     query: str
     limit: Optional[int] = 10
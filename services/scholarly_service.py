@@ -1,4 +1,3 @@
-from scholarly import scholarly
 from typing import List, Dict, Any
 import json
 
@@ -9,6 +8,8 @@ class ScholarlyService:
         Search for papers on Google Scholar
         """
         try:
+            # scholarly is slow to import, load it on first use rather than at startup
+            from scholarly import scholarly
             search_query = scholarly.search_pubs(query)
             results = []
             
@@ -42,6 +43,7 @@ class ScholarlyService:
         Get information about an author
         """
         try:
+            from scholarly import scholarly
             search_query = scholarly.search_author(author_name)
             author = next(search_query)
             author_details = scholarly.fill(author)